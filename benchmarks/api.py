@@ -0,0 +1,383 @@
+"""
+Load test every API endpoint against a seeded SQLite database and an in-process HTTP server.
+
+    python -m benchmarks.api --movies 10000 --reviews 100000 --requests 500 --concurrency 8 --output run.json
+    python -m benchmarks.api --database catalog.sqlite3 --reuse --compare run.json
+
+Each endpoint is driven by concurrent clients over real sockets. The run reports latency percentiles,
+throughput, queries per request and peak traced memory per endpoint, and can be saved as JSON and
+compared with an earlier run.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'imdb.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+from rest_framework.views import APIView  # noqa: E402
+
+from movielist_app import models  # noqa: E402
+from movielist_app.management.commands import seed_catalog  # noqa: E402
+
+
+class PooledServer(WSGIServer):
+    """
+    Hands each connection to a fixed pool of threads, so a thread's database connection outlives its request
+    """
+    request_queue_size = 128
+
+    def __init__(self, *args, threads, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QueryCounter:
+    """
+    Wraps the WSGI application to count each request's queries by the endpoint named in its X-Benchmark header
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        # a worker's first request opens its connection, which isn't part of what the endpoint costs
+        connection.ensure_connection()
+        with connection.execute_wrapper(count):
+            response = self.application(environ, start_response)
+            try:
+                # streamed responses query while they're iterated
+                body = b''.join(response)
+            finally:
+                response.close()
+        with self.lock:
+            self.counts.setdefault(environ.get('HTTP_X_BENCHMARK'), []).append(queries)
+        return [body]
+
+
+class Context:
+    """
+    Ids and credentials the endpoints draw their requests from
+    Writes use their own users, so concurrent clients never create the same review twice
+    """
+
+    def __init__(self, rng, writers):
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.movie_ids = list(models.Movie.objects.values_list('id', flat=True))
+        self.platform_ids = list(models.StreamPlatform.objects.values_list('id', flat=True))
+        review_ids = models.Review.objects.order_by('id').values_list('id', flat=True)
+        self.review_ids = (review_ids.first() or 0, review_ids.last() or 0)
+        self.usernames = list(User.objects.filter(username__startswith='user').values_list('username', flat=True)[:1000])
+
+        admin, created = User.objects.get_or_create(username='benchmark-admin', defaults={'is_staff': True})
+        self.admin_token = Token.objects.get_or_create(user=admin)[0].key
+        self.writers = []
+        for i in range(writers):
+            user, created = User.objects.get_or_create(username='benchmark-writer%d' % i)
+            models.Review.objects.filter(review_user=user).delete()
+            self.writers.append(Token.objects.get_or_create(user=user)[0].key)
+        self.writes = itertools.count()
+        self.registrations = itertools.count()
+        self.registered_tokens = []
+
+    def movie(self):
+        return self.rng.choice(self.movie_ids)
+
+    def platform(self):
+        return self.rng.choice(self.platform_ids)
+
+    def review(self):
+        return self.rng.randint(*self.review_ids)
+
+    def username(self):
+        return self.rng.choice(self.usernames)
+
+    def next_write(self, size=1):
+        # every writer reviews the movies in order, so (writer, movie) pairs never repeat
+        with self.lock:
+            index = next(self.writes)
+        writer = self.writers[index % len(self.writers)]
+        first = index // len(self.writers) * size
+        return writer, [self.movie_ids[(first + i) % len(self.movie_ids)] for i in range(size)]
+
+    def register(self):
+        with self.lock:
+            return 'benchmark-%d-%d' % (os.getpid(), next(self.registrations))
+
+    def registered_token(self):
+        with self.lock:
+            return self.registered_tokens.pop() if self.registered_tokens else None
+
+
+def review_create(context):
+    writer, movies = context.next_write()
+    return 'POST', '/imdb/%d/review-create/' % movies[0], writer, {
+        'rating': context.rng.randint(1, 5), 'description': 'Benchmark review', 'active': True}
+
+
+def review_bulk_create(context):
+    writer, movies = context.next_write(10)
+    return 'POST', '/imdb/review-bulk-create/', writer, [
+        {'movie': movie, 'rating': context.rng.randint(1, 5), 'description': 'Benchmark review'} for movie in movies]
+
+
+def register(context):
+    username = context.register()
+    return 'POST', '/account/register/', None, {
+        'username': username, 'email': username + '@example.com',
+        'password': 'NewPassword@123', 'password2': 'NewPassword@123'}
+
+
+def logout(context):
+    return 'POST', '/account/logout/', context.registered_token(), None
+
+
+# name -> request factory returning (method, path, token, json body)
+ENDPOINTS = {
+    'movie-list': lambda c: ('GET', '/imdb/list/', None, None),
+    'movie-list-search': lambda c: ('GET', '/imdb/list/?search=movie%%20%d' % c.rng.randrange(100), None, None),
+    'movie-list-compact': lambda c: ('GET', '/imdb/list/compact/', None, None),
+    'movie-detail': lambda c: ('GET', '/imdb/%d/' % c.movie(), None, None),
+    'movie-batch': lambda c: ('GET', '/imdb/batch/?ids=' + ','.join(str(c.movie()) for i in range(40)), None, None),
+    'movie-top': lambda c: ('GET', '/imdb/top/?platform=%d' % c.platform(), None, None),
+    'movie-trending': lambda c: ('GET', '/imdb/trending/', None, None),
+    'movie-stats': lambda c: ('GET', '/imdb/%d/stats/' % c.movie(), None, None),
+    'movie-stats-batch': lambda c: ('GET', '/imdb/stats/?ids=' + ','.join(str(c.movie()) for i in range(40)), None, None),
+    'stream-list': lambda c: ('GET', '/imdb/stream/list/', None, None),
+    'stream-list-expanded': lambda c: ('GET', '/imdb/stream/list/?expand=watchlist,reviews&size=5', None, None),
+    'stream-detail': lambda c: ('GET', '/imdb/stream/%d/' % c.platform(), None, None),
+    'reviews-for-movie': lambda c: ('GET', '/imdb/%d/review/' % c.movie(), None, None),
+    'review-detail': lambda c: ('GET', '/imdb/review/%d/' % c.review(), None, None),
+    'reviews-by-user': lambda c: ('GET', '/imdb/reviews/%s/' % c.username(), c.admin_token, None),
+    'cache-stats': lambda c: ('GET', '/imdb/cache-stats/', c.admin_token, None),
+    'review-create': review_create,
+    'review-bulk-create': review_bulk_create,
+    'login': lambda c: ('POST', '/account/login/', None, {'username': c.username(), 'password': seed_catalog.PASSWORD}),
+    'registration': register,
+    # logs out the users registered by the previous endpoint
+    'logout': logout,
+}
+
+
+def send(port, endpoint, method, path, token, body):
+    headers = {'X-Benchmark': endpoint, 'Accept': 'application/json'}
+    if token:
+        headers['Authorization'] = 'Token ' + token
+    if body is not None:
+        body = json.dumps(body)
+        headers['Content-Type'] = 'application/json'
+    client = http.client.HTTPConnection('127.0.0.1', port)
+    started = time.perf_counter()
+    client.request(method, path, body=body, headers=headers)
+    response = client.getresponse()
+    content = response.read()
+    elapsed = time.perf_counter() - started
+    client.close()
+    return response.status, content, elapsed
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_endpoint(port, name, context, requests, concurrency):
+    factory = ENDPOINTS[name]
+
+    def one(i):
+        status, content, elapsed = send(port, name, *factory(context))
+        if name == 'registration' and status == 201:
+            context.registered_tokens.append(json.loads(content)['token'])
+        return status, elapsed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(requests)))
+    duration = time.perf_counter() - started
+    latencies = sorted(elapsed for status, elapsed in results)
+    return {
+        'requests': requests,
+        'errors': sum(1 for status, elapsed in results if status >= 400),
+        'throughput_rps': round(requests / duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def measure_memory(port, name, context, requests):
+    # sequentially and separately from the timed run, since tracing slows everything down
+    factory = ENDPOINTS[name]
+    tracemalloc.start()
+    try:
+        for i in range(requests):
+            send(port, name, *factory(context))
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous):
+    print('\ncompared with %s' % (previous['meta'].get('commit') or 'the previous run'))
+    for name, current in results['endpoints'].items():
+        before = previous['endpoints'].get(name)
+        if not before:
+            continue
+        changes = ['%s %+.0f%%' % (key, (current[key] - before[key]) / before[key] * 100)
+                   for key in ('p50_ms', 'p99_ms', 'throughput_rps') if before[key]]
+        if current['queries'] != before['queries']:
+            changes.append('queries %s -> %s' % (before['queries'], current['queries']))
+        print('%-22s %s' % (name, '  '.join(changes)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', help='SQLite file to seed, a temporary one by default')
+    parser.add_argument('--reuse', action='store_true', help="use the database's existing rows instead of seeding")
+    parser.add_argument('--platforms', type=int, default=20)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--movies', type=int, default=5000)
+    parser.add_argument('--reviews', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients and server threads')
+    parser.add_argument('--memory-requests', type=int, default=10, help='requests per endpoint with memory tracing')
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument('--uncached', action='store_true', help='disable the response cache')
+    parser.add_argument('--throttle', action='store_true', help='keep the rate limits on')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='a previous JSON result to compare with')
+    args = parser.parse_args()
+
+    directory = None
+    if not args.database:
+        directory = tempfile.mkdtemp()
+        args.database = os.path.join(directory, 'benchmark.sqlite3')
+    connections.settings['default']['NAME'] = args.database
+    settings.SECURE_SSL_REDIRECT = False
+    settings.ALLOWED_HOSTS = ['127.0.0.1']
+    if args.uncached:
+        settings.RESPONSE_CACHE_TIMEOUT = 0
+    if not args.throttle:
+        APIView.get_throttles = lambda view: []
+
+    started = time.perf_counter()
+    call_command('migrate', verbosity=0)
+    if not args.reuse:
+        call_command('seed_catalog', platforms=args.platforms, users=args.users, movies=args.movies,
+                     reviews=args.reviews, seed=args.seed, stdout=sys.stderr)
+    seeded = time.perf_counter() - started
+    context = Context(random.Random(args.seed), writers=args.concurrency * 2)
+    sizes = {model.__name__: model.objects.count() for model in (models.StreamPlatform, User, models.Movie, models.Review)}
+    connections.close_all()
+    print('%s, prepared in %.1fs' % (', '.join('%d %s' % (count, name) for name, count in sizes.items()), seeded),
+          file=sys.stderr)
+
+    application = QueryCounter(get_wsgi_application())
+    server = make_server('127.0.0.1', 0, application, server_class=lambda *server_args, **kwargs: PooledServer(
+        *server_args, threads=args.concurrency, **kwargs), handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    results = {
+        'meta': {
+            'commit': get_commit(),
+            'python': sys.version.split()[0],
+            'django': django.get_version(),
+            'rows': sizes,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'cached': not args.uncached,
+            'throttled': args.throttle,
+        },
+        'endpoints': {},
+    }
+    print('%-22s %8s %8s %8s %9s %7s %9s %6s' % ('endpoint', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s', 'queries',
+                                                  'peak KiB', 'errors'))
+    try:
+        # in ENDPOINTS order, so logout finds the tokens registration created
+        for name in [name for name in ENDPOINTS if name in args.endpoints]:
+            application.counts.pop(name, None)
+            result = run_endpoint(port, name, context, args.requests, args.concurrency)
+            counts = application.counts.pop(name, [0])
+            result['queries'] = round(statistics.mean(counts), 2)
+            result['peak_memory_kib'] = measure_memory(port, name, context, args.memory_requests)
+            results['endpoints'][name] = result
+            print('%-22s %8.2f %8.2f %8.2f %9.1f %7.2f %9.1f %6d' % (
+                name, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['throughput_rps'],
+                result['queries'], result['peak_memory_kib'], result['errors']))
+    finally:
+        server.shutdown()
+        server.executor.shutdown()
+        connections.close_all()
+        if directory:
+            # the pool's threads still hold their connections, and with them the WAL files
+            shutil.rmtree(directory, ignore_errors=True)
+    results['meta']['max_rss_kib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(results, json.load(previous))
+
+
+if __name__ == '__main__':
+    main()
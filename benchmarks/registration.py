@@ -0,0 +1,95 @@
+"""
+Load test the registration endpoint with concurrent clients.
+
+    python -m benchmarks.registration --users 200 --concurrency 8 --iterations 390000 100000
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'imdb.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment  # noqa: E402
+from user_app.api.views import registration_view  # noqa: E402
+
+
+def register(client, username):
+    started = time.perf_counter()
+    response = client.post('/account/register/', {
+        'username': username,
+        'email': username + '@example.com',
+        'password': 'NewPassword@123',
+        'password2': 'NewPassword@123',
+    }, secure=True)
+    assert response.status_code == 201, response.content
+    return time.perf_counter() - started
+
+
+def run(prefix, users, concurrency):
+    usernames = iter(range(users))
+    lock = threading.Lock()
+    latencies = []
+
+    def client_thread():
+        client = Client()
+        while True:
+            with lock:
+                index = next(usernames, None)
+            if index is None:
+                break
+            latency = register(client, '%s%d' % (prefix, index))
+            with lock:
+                latencies.append(latency)
+        connections.close_all()
+
+    threads = [threading.Thread(target=client_thread) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return users / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200, help='registrations per run')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--iterations', type=int, nargs='+', default=[settings.PASSWORD_HASH_ITERATIONS],
+                        help='PBKDF2 work factors to compare')
+    args = parser.parse_args()
+
+    # a file database, so every client thread's connection sees the same tables
+    setup_test_environment()
+    directory = tempfile.mkdtemp()
+    connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'registration.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0)
+    # the anonymous rate limit would reject most of the run
+    registration_view.cls.throttle_classes = []
+
+    print('%d registrations, %d concurrent clients' % (args.users, args.concurrency))
+    try:
+        for iterations in args.iterations:
+            with override_settings(PASSWORD_HASH_ITERATIONS=iterations):
+                throughput, p50, p95 = run('i%d_' % iterations, args.users, args.concurrency)
+            print('%7d PBKDF2 iterations %8.1f registrations/s  p50 %6.1f ms  p95 %6.1f ms'
+                  % (iterations, throughput, p50 * 1000, p95 * 1000))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare DRF's JSONRenderer with FastJSONRenderer on MovieList-shaped pages.
+
+    python -m benchmarks.renderers --pages 200 --reviews 5
+"""
+import argparse
+import datetime
+import os
+import random
+import timeit
+from collections import OrderedDict
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'imdb.settings')
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from movielist_app.api.renderers import FastJSONRenderer, orjson  # noqa: E402
+
+
+def timestamp(rng):
+    created = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+    created += datetime.timedelta(seconds=rng.randrange(30_000_000), microseconds=rng.randrange(1_000_000))
+    return created.isoformat().replace('+00:00', 'Z')
+
+
+def movie_list_page(rng, page_size, reviews_per_movie):
+    results = []
+    for movie_id in range(page_size):
+        reviews = [OrderedDict([
+            ('id', movie_id * reviews_per_movie + i),
+            ('review_user', 'user%d' % rng.randrange(10_000)),
+            ('rating', rng.randint(1, 5)),
+            ('description', 'A review with a little bit of text about the movie ' * rng.randint(1, 3)),
+            ('active', True),
+            ('created', timestamp(rng)),
+            ('update', timestamp(rng)),
+        ]) for i in range(reviews_per_movie)]
+        ratings = [review['rating'] for review in reviews]
+        results.append(OrderedDict([
+            ('id', movie_id),
+            ('reviews', reviews),
+            ('title', 'Movie %d' % movie_id),
+            ('storyline', 'Something happens to someone somewhere, and then it gets worse'),
+            ('active', True),
+            ('avg_rating', sum(ratings) / len(ratings) if ratings else 0.0),
+            ('num_ratings', len(ratings)),
+            ('created', timestamp(rng)),
+        ]))
+    return OrderedDict([('count', 100_000), ('next', 'http://testserver/imdb/list/?cursor=cD0yMA%3D%3D'),
+                        ('previous', None), ('results', results)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200, help='distinct pages to render per run')
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--reviews', type=int, default=5, help='reviews nested in each movie')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    pages = [movie_list_page(rng, args.page_size, args.reviews) for i in range(args.pages)]
+    renderers = [('stdlib', JSONRenderer()), ('fast (%s)' % ('orjson' if orjson else 'stdlib fallback'), FastJSONRenderer())]
+
+    for page in pages[:5]:
+        assert renderers[0][1].render(page) == renderers[1][1].render(page), 'renderer outputs differ'
+
+    size = sum(len(renderers[0][1].render(page)) for page in pages) / len(pages)
+    print('%d pages of %d movies x %d reviews, %.1f KiB per page' % (args.pages, args.page_size, args.reviews, size / 1024))
+    baseline = None
+    for name, renderer in renderers:
+        best = min(timeit.repeat(lambda: [renderer.render(page) for page in pages], number=1, repeat=args.repeat))
+        per_page = best / len(pages) * 1e6
+        baseline = baseline or per_page
+        print('%-24s %8.1f us/page  %6.2fx' % (name, per_page, baseline / per_page))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Compare concurrent write throughput under each database connection mode.
+
+    python -m benchmarks.writes --requests 500 --concurrency 8
+    python -m benchmarks.writes --modes reconnect persistent --workloads review-create
+
+Every mode serves the same seeded catalog, copied fresh, from a server with a fixed pool of worker threads
+like a threaded production server, so persistent connections are actually reused between requests.
+SQLite modes toggle the tuning in SQLITE_PRAGMAS. On PostgreSQL (IMDB_DB_ENGINE=postgresql) only the connection
+modes apply, and the catalog is seeded into the configured database once.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import make_server
+
+from benchmarks.api import (Context, PooledServer, QuietHandler, percentile, review_create,  # noqa: E402 (sets up Django)
+                            send)
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.db import connections  # noqa: E402
+from rest_framework.views import APIView  # noqa: E402
+
+# the pragmas SQLite connections start with, before any tuning
+SQLITE_DEFAULTS = {'journal_mode': 'delete', 'synchronous': 'full', 'busy_timeout': 5000, 'mmap_size': 0}
+
+# name -> (settings_dict changes, SQLite pragmas or None to keep SQLITE_PRAGMAS)
+MODES = {
+    'reconnect': ({'CONN_MAX_AGE': 0}, SQLITE_DEFAULTS),
+    'persistent': ({'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}, SQLITE_DEFAULTS),
+    'wal': ({'CONN_MAX_AGE': 0}, None),
+    'persistent-wal': ({'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}, None),
+}
+SQLITE_ONLY = {'wal', 'persistent-wal'}
+
+
+def movie_update(context):
+    movie = context.movie()
+    return 'PUT', '/imdb/%d/' % movie, context.admin_token, {
+        'title': 'Movie %d' % movie, 'storyline': 'Updated %d' % context.rng.randrange(1000), 'platform': 'Platform 0'}
+
+
+def mixed(context):
+    # four uncached reads for every review, the reads keep the writers company
+    if context.rng.random() < 0.2:
+        return review_create(context)
+    return 'GET', '/imdb/%d/' % context.movie(), None, None
+
+
+WORKLOADS = {
+    'review-create': review_create,
+    'movie-update': movie_update,
+    'mixed': mixed,
+}
+
+
+def run(port, name, context, requests, concurrency):
+    factory = WORKLOADS[name]
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(i):
+        status, content, elapsed = send(port, name, *factory(context))
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+        return elapsed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(one, range(requests)))
+    duration = time.perf_counter() - started
+    return {
+        'throughput_rps': requests / duration,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'errors': sum(count for status, count in statuses.items() if status >= 400),
+    }
+
+
+def serve(threads):
+    server = make_server('127.0.0.1', 0, get_wsgi_application(), server_class=lambda *args, **kwargs: PooledServer(
+        *args, threads=threads, **kwargs), handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--workloads', nargs='+', choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument('--movies', type=int, default=2000)
+    parser.add_argument('--reviews', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=300, help='requests per workload and mode')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients and server threads')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    database = connections.settings['default']
+    sqlite = database['ENGINE'] == 'django.db.backends.sqlite3'
+    modes = [mode for mode in args.modes if sqlite or mode not in SQLITE_ONLY]
+    settings.SECURE_SSL_REDIRECT = False
+    settings.ALLOWED_HOSTS = ['127.0.0.1']
+    # reads and rate limits would otherwise hide the database
+    settings.RESPONSE_CACHE_TIMEOUT = 0
+    APIView.get_throttles = lambda view: []
+
+    directory = tempfile.mkdtemp()
+    catalog = os.path.join(directory, 'catalog.sqlite3')
+    if sqlite:
+        database['NAME'] = catalog
+    call_command('migrate', verbosity=0)
+    call_command('seed_catalog', platforms=10, users=200, movies=args.movies, reviews=args.reviews,
+                 seed=args.seed, stdout=open(os.devnull, 'w'))
+    connections.close_all()
+    tuned_pragmas = settings.SQLITE_PRAGMAS
+
+    print('%s, %d requests per workload, %d concurrent clients' % (
+        'SQLite' if sqlite else database['ENGINE'].rsplit('.', 1)[-1], args.requests, args.concurrency))
+    print('%-16s %-14s %9s %8s %8s %6s' % ('mode', 'workload', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+    try:
+        for mode in modes:
+            changes, pragmas = MODES[mode]
+            database.update(changes)
+            settings.SQLITE_PRAGMAS = tuned_pragmas if pragmas is None else pragmas
+            if sqlite:
+                database['NAME'] = os.path.join(directory, mode + '.sqlite3')
+                shutil.copy(catalog, database['NAME'])
+            server = serve(args.concurrency)
+            try:
+                for workload in args.workloads:
+                    context = Context(random.Random(args.seed), writers=args.concurrency * 2)
+                    connections.close_all()
+                    result = run(server.server_address[1], workload, context, args.requests, args.concurrency)
+                    print('%-16s %-14s %9.1f %8.2f %8.2f %6d' % (
+                        mode, workload, result['throughput_rps'], result['p50_ms'], result['p99_ms'], result['errors']))
+            finally:
+                server.shutdown()
+                server.executor.shutdown()
+                connections.close_all()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+from django.conf import settings
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    Tunes each new SQLite connection with SQLITE_PRAGMAS, connected to connection_created in
+        WatchlistAppConfig.ready
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
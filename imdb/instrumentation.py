@@ -0,0 +1,256 @@
+"""
+Per-request performance instrumentation.
+
+InstrumentationMiddleware times every request and, for a sampled fraction of them (INSTRUMENTATION_SAMPLE_RATE),
+breaks the time down into database queries, authentication, throttling, serialization and rendering.
+The breakdown is sent back in a Server-Timing header, optionally logged as one JSON line per request
+(INSTRUMENTATION_LOG), and aggregated into per-route histograms that get_metrics() returns.
+
+Code reports its share of a request with `with timed('serialize'): ...`, which costs a context variable lookup
+when the request isn't sampled. Queries are timed by an execute wrapper installed on every database connection.
+"""
+import asyncio
+import bisect
+import contextlib
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# the parts of a request that are timed, in Server-Timing order
+PHASES = ('db', 'auth', 'throttle', 'serialize', 'render')
+
+# histogram bucket upper bounds, in milliseconds
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current = contextvars.ContextVar('timings', default=None)
+_untimed = contextlib.nullcontext()
+
+routes = {}
+_routes_lock = threading.Lock()
+
+
+class Timer:
+    __slots__ = ('timings', 'name', 'started')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.timings.active.add(self.name)
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings.durations[self.name] += time.perf_counter() - self.started
+        self.timings.active.discard(self.name)
+
+
+class Timings:
+    """
+    The time a request spent in each phase, in seconds
+    A phase's time includes whatever it triggers, e.g. serializing a queryset includes its queries
+    """
+
+    def __init__(self):
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+        self.active = set()
+
+    def timer(self, name):
+        # nested timers of the same phase, like a serializer's nested serializers, are only counted once
+        if name in self.active:
+            return _untimed
+        return Timer(self, name)
+
+
+def timed(name):
+    timings = _current.get()
+    if timings is None:
+        return _untimed
+    return timings.timer(name)
+
+
+def time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    timings.queries += 1
+    with timings.timer('db'):
+        return execute(sql, params, many, context)
+
+
+def instrument(connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+connection_created.connect(instrument)
+
+
+class Histogram:
+    __slots__ = ('counts', 'total')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+
+    def add(self, milliseconds):
+        self.counts[bisect.bisect_left(BUCKETS, milliseconds)] += 1
+        self.total += milliseconds
+
+    def percentile(self, fraction):
+        # the upper bound of the bucket holding the percentile, None when it's past the last bound
+        rank = fraction * sum(self.counts)
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        count = sum(self.counts)
+        return {
+            'count': count,
+            'mean_ms': self.total / count if count else 0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'buckets': {str(bound): count for bound, count in zip(BUCKETS + ('inf',), self.counts)},
+        }
+
+
+class RouteMetrics:
+    __slots__ = ('requests', 'errors', 'duration', 'sampled', 'queries', 'phases')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.duration = Histogram()
+        self.sampled = 0
+        self.queries = Histogram()
+        self.phases = {phase: Histogram() for phase in PHASES}
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'duration': self.duration.as_dict(),
+            'sampled': self.sampled,
+            # query counts use the same buckets as the times
+            'queries': self.queries.as_dict(),
+            'phases': {phase: histogram.as_dict() for phase, histogram in self.phases.items()},
+        }
+
+
+def get_route(request):
+    match = getattr(request, 'resolver_match', None)
+    return '%s /%s' % (request.method, match.route if match is not None else '<unresolved>')
+
+
+def record(request, response, duration, timings):
+    route = get_route(request)
+    with _routes_lock:
+        metrics = routes.get(route)
+        if metrics is None:
+            metrics = routes[route] = RouteMetrics()
+        metrics.requests += 1
+        metrics.errors += response.status_code >= 500
+        metrics.duration.add(duration * 1000)
+        if timings is not None:
+            metrics.sampled += 1
+            metrics.queries.add(timings.queries)
+            for phase, seconds in timings.durations.items():
+                metrics.phases[phase].add(seconds * 1000)
+
+
+def get_metrics():
+    with _routes_lock:
+        return {route: metrics.as_dict() for route, metrics in sorted(routes.items())}
+
+
+def reset_metrics():
+    with _routes_lock:
+        routes.clear()
+
+
+def get_server_timing(duration, timings):
+    entries = ['total;dur=%.2f' % (duration * 1000)]
+    for phase, seconds in timings.durations.items():
+        if phase == 'db':
+            entries.append('db;dur=%.2f;desc="%d queries"' % (seconds * 1000, timings.queries))
+        elif seconds:
+            entries.append('%s;dur=%.2f' % (phase, seconds * 1000))
+    return ', '.join(entries)
+
+
+def log(request, response, duration, timings):
+    logger.info(json.dumps({
+        'route': get_route(request),
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 2),
+        'queries': timings.queries,
+        **{phase + '_ms': round(seconds * 1000, 2) for phase, seconds in timings.durations.items()},
+    }))
+
+
+class InstrumentationMiddleware:
+    """
+    Times every request per route, and a sampled fraction of them per phase
+    Goes first in MIDDLEWARE, so the other middleware's time counts too
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        # connections opened before the middleware was loaded missed connection_created
+        for connection in connections.all(initialized_only=True):
+            instrument(connection)
+
+    def start(self):
+        if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+            return None, None
+        timings = Timings()
+        return timings, _current.set(timings)
+
+    def finish(self, request, response, duration, timings):
+        if timings is not None:
+            response['Server-Timing'] = get_server_timing(duration, timings)
+            if settings.INSTRUMENTATION_LOG:
+                log(request, response, duration, timings)
+        record(request, response, duration, timings)
+        return response
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        timings, token = self.start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                _current.reset(token)
+        return self.finish(request, response, time.perf_counter() - started, timings)
+
+    async def __acall__(self, request):
+        timings, token = self.start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                _current.reset(token)
+        return self.finish(request, response, time.perf_counter() - started, timings)
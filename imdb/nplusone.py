@@ -0,0 +1,197 @@
+"""
+N+1 query detection.
+
+Groups the queries run inside a block by their SQL template, with parameters, literals and IN lists collapsed,
+and flags every template that runs more than REPEATED_QUERY_THRESHOLD times. Each flagged template is reported
+with the serializer field path that ran it, e.g. MovieSerializer.reviews.review_user, and the closest line of
+project code.
+
+    with assert_no_repeated_queries():
+        self.client.get(reverse('movie-list'))
+
+RepeatedQueriesMiddleware logs the same report as a warning for every request that repeats a query.
+It's enabled with DEBUG, or REPEATED_QUERY_WARNINGS.
+"""
+import asyncio
+import collections
+import contextlib
+import contextvars
+import logging
+import os
+import re
+import sys
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+_detector = contextvars.ContextVar('query_detector', default=None)
+
+_strings = re.compile(r"'(?:[^']|'')*'")
+_numbers = re.compile(r'\b\d+(?:\.\d+)?\b')
+_lists = re.compile(r'\(%s(?:, %s)*\)')
+_spaces = re.compile(r'\s+')
+
+_serializer_code = serializers.Serializer.to_representation.__code__
+_project_root = str(settings.BASE_DIR) + os.sep
+# libraries, and this package's middleware and query wrappers
+_skipped_paths = (os.path.dirname(__file__) + os.sep,
+                  *(path for path in sys.path if path.startswith(sys.prefix) or 'site-packages' in path))
+
+
+def normalize(sql):
+    sql = _numbers.sub('%s', _strings.sub('%s', sql))
+    return _spaces.sub(' ', _lists.sub('(%s, ...)', sql)).strip()
+
+
+def trace():
+    """
+    The serializer field path being rendered, from the outermost serializer in, and the line of project code
+        that ran the query, or that started serializing when a serializer ran it
+    """
+    path = []
+    serializer = source = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        if code is _serializer_code and 'field' in frame.f_locals:
+            # the locals of each Serializer.to_representation frame name the field it's on
+            path.append(frame.f_locals['field'].field_name)
+            serializer = frame.f_locals['self']
+        if code.co_name == 'to_representation':
+            source = None
+        elif source is None and code.co_filename.startswith(_project_root) \
+                and not code.co_filename.startswith(_skipped_paths):
+            source = '%s:%d in %s' % (os.path.relpath(code.co_filename, _project_root), frame.f_lineno, code.co_name)
+        frame = frame.f_back
+    field_path = '.'.join([type(serializer).__name__, *reversed(path)]) if path else None
+    return field_path, source
+
+
+class QueryPattern:
+
+    def __init__(self, template):
+        self.template = template
+        self.count = 0
+        self.field_paths = collections.Counter()
+        self.sources = collections.Counter()
+
+    def __str__(self):
+        lines = ['%dx %s' % (self.count, self.template)]
+        for field_path, count in self.field_paths.most_common():
+            lines.append('    %dx from serializer field %s' % (count, field_path))
+        for source, count in self.sources.most_common(3):
+            lines.append('    %dx at %s' % (count, source))
+        return '\n'.join(lines)
+
+
+def record_query(execute, sql, params, many, context):
+    detector = _detector.get()
+    if detector is not None:
+        detector.record(sql)
+    return execute(sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class QueryPatternDetector:
+    """
+    Records the query templates run inside the block, including sync_to_async calls, which run in a copy of
+        its context. Threads started any other way don't see the detector
+    A detector nested in another, like the middleware's inside a test's, passes its queries on to the outer one
+    Queries only cost anything while a detector is active
+    """
+
+    def __init__(self, threshold=None):
+        self.threshold = settings.REPEATED_QUERY_THRESHOLD if threshold is None else threshold
+        self.patterns = {}
+
+    def __enter__(self):
+        connection_created.connect(install, dispatch_uid='imdb.nplusone.install')
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+        self.outer = _detector.get()
+        self.token = _detector.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _detector.reset(self.token)
+
+    def record(self, sql):
+        template = normalize(sql)
+        field_path, source = trace()
+        detector = self
+        while detector is not None:
+            detector.add(template, field_path, source)
+            detector = detector.outer
+
+    def add(self, template, field_path, source):
+        pattern = self.patterns.get(template)
+        if pattern is None:
+            pattern = self.patterns[template] = QueryPattern(template)
+        pattern.count += 1
+        if field_path is not None:
+            pattern.field_paths[field_path] += 1
+        if source is not None:
+            pattern.sources[source] += 1
+
+    @property
+    def repeated(self):
+        return sorted((pattern for pattern in self.patterns.values() if pattern.count > self.threshold),
+                      key=lambda pattern: -pattern.count)
+
+    def report(self):
+        return '%d queries repeated more than %d times:\n%s' % (
+            len(self.repeated), self.threshold, '\n'.join(str(pattern) for pattern in self.repeated))
+
+
+class RepeatedQueries(AssertionError):
+    pass
+
+
+@contextlib.contextmanager
+def assert_no_repeated_queries(threshold=None):
+    with QueryPatternDetector(threshold) as detector:
+        yield detector
+    if detector.repeated:
+        raise RepeatedQueries(detector.report())
+
+
+class RepeatedQueriesMiddleware:
+    """
+    Logs a warning, with the responsible serializer fields, for each request that repeats a query
+    A development aid, tracing every query costs a walk up the stack
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPEATED_QUERY_WARNINGS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def warn(self, request, detector):
+        if detector.repeated:
+            logger.warning('%s %s: %s', request.method, request.get_full_path(), detector.report())
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        with QueryPatternDetector() as detector:
+            response = self.get_response(request)
+        self.warn(request, detector)
+        return response
+
+    async def __acall__(self, request):
+        with QueryPatternDetector() as detector:
+            response = await self.get_response(request)
+        self.warn(request, detector)
+        return response
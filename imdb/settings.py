@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 from pathlib import Path
 import os
 
+import django
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -47,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'imdb.instrumentation.InstrumentationMiddleware',
+    'imdb.nplusone.RepeatedQueriesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,17 +80,119 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'imdb.wsgi.application'
 
+# Serve the hot read endpoints from async views, for deployments behind an ASGI server
+ASYNC_READ_VIEWS = os.environ.get('IMDB_ASYNC_READ_VIEWS', 'false').lower() in ('true', '1')
+
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# IMDB_DB_ENGINE selects sqlite (default, single node) or postgresql, which needs psycopg2 or psycopg
+# and is configured by IMDB_DB_NAME, IMDB_DB_USER, IMDB_DB_PASSWORD, IMDB_DB_HOST and IMDB_DB_PORT
+
+DATABASE_BACKENDS = {
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('IMDB_DB_NAME', BASE_DIR / 'db.sqlite3'),
+    },
+    'postgresql': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('IMDB_DB_NAME', 'imdb'),
+        'USER': os.environ.get('IMDB_DB_USER', ''),
+        'PASSWORD': os.environ.get('IMDB_DB_PASSWORD', ''),
+        'HOST': os.environ.get('IMDB_DB_HOST', ''),
+        'PORT': os.environ.get('IMDB_DB_PORT', ''),
+    },
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        **DATABASE_BACKENDS[os.environ.get('IMDB_DB_ENGINE', 'sqlite')],
+        # seconds a worker thread keeps its connection between requests, 0 reconnects on every request
+        'CONN_MAX_AGE': int(os.environ.get('IMDB_DB_CONN_MAX_AGE', 60)),
+        # a kept connection is checked before it's reused, so a restarted database doesn't fail a request
+        'CONN_HEALTH_CHECKS': os.environ.get('IMDB_DB_CONN_HEALTH_CHECKS', 'true').lower() in ('true', '1'),
+        'OPTIONS': {},
     }
 }
 
+# PostgreSQL connections are pooled with IMDB_DB_POOL_SIZE > 0 on Django 5.1 and later (psycopg 3 with
+# psycopg-pool). A pool replaces persistent connections. Older versions keep them, and pool with pgbouncer instead
+DATABASE_POOL_SIZE = int(os.environ.get('IMDB_DB_POOL_SIZE', 0))
+if DATABASE_POOL_SIZE and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql' \
+        and django.VERSION >= (5, 1):
+    DATABASES['default']['OPTIONS']['pool'] = {'min_size': 2, 'max_size': DATABASE_POOL_SIZE}
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# applied to every new SQLite connection by imdb.db.configure_connection.
+# WAL lets reads carry on while a write commits, synchronous=NORMAL only syncs at checkpoints in WAL mode,
+# so a power loss can lose the last commits but not corrupt the database
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('IMDB_SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.environ.get('IMDB_SQLITE_SYNCHRONOUS', 'normal'),
+    # milliseconds a writer waits for the database lock before failing with "database is locked"
+    'busy_timeout': int(os.environ.get('IMDB_SQLITE_BUSY_TIMEOUT', 5000)),
+    'mmap_size': int(os.environ.get('IMDB_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# IMDB_CACHE_BACKEND selects locmem (default, per process), file, or redis (shared between workers)
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('IMDB_CACHE_LOCATION', BASE_DIR / 'cache'),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('IMDB_CACHE_LOCATION', 'redis://127.0.0.1:6379'),
+    },
+}
+
+# cached responses get a store of their own, so they can't evict the throttle counters and tokens,
+# and clearing them leaves those alone. IMDB_RESPONSE_CACHE_LOCATION can point it at another server
+RESPONSE_CACHE_LOCATIONS = {
+    'locmem': 'responses',
+    'file': BASE_DIR / 'cache' / 'responses',
+    'redis': 'redis://127.0.0.1:6379/1',
+}
+
+CACHE_BACKEND = os.environ.get('IMDB_CACHE_BACKEND', 'locmem')
+
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+    'responses': {
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.environ.get('IMDB_RESPONSE_CACHE_LOCATION', RESPONSE_CACHE_LOCATIONS[CACHE_BACKEND]),
+    },
+}
+
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('IMDB_RESPONSE_CACHE_TIMEOUT', 300))
+
+TOKEN_CACHE_ALIAS = 'default'
+TOKEN_CACHE_TIMEOUT = int(os.environ.get('IMDB_TOKEN_CACHE_TIMEOUT', 60))
+
+# every request is timed per route, this fraction of them also per phase (queries, auth, throttling,
+# serialization, rendering), reported in a Server-Timing header and, with IMDB_INSTRUMENTATION_LOG=true,
+# logged as JSON to the imdb.instrumentation logger
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('IMDB_INSTRUMENTATION_SAMPLE_RATE', 0.1))
+INSTRUMENTATION_LOG = os.environ.get('IMDB_INSTRUMENTATION_LOG', 'false').lower() in ('true', '1')
+
+# queries that run more than this many times in one request or assert_no_repeated_queries() block are
+# reported as N+1 queries, logged as warnings with IMDB_REPEATED_QUERY_WARNINGS=true (the default with DEBUG)
+REPEATED_QUERY_THRESHOLD = int(os.environ.get('IMDB_REPEATED_QUERY_THRESHOLD', 5))
+REPEATED_QUERY_WARNINGS = os.environ.get('IMDB_REPEATED_QUERY_WARNINGS', str(DEBUG)).lower() in ('true', '1')
+
+# seconds after which a review counts half as much towards its movie's trending score.
+# Changing it only affects reviews written afterwards, until the scores are rebuilt
+TRENDING_HALF_LIFE = int(os.environ.get('IMDB_TRENDING_HALF_LIFE', 7 * 24 * 3600))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -106,6 +212,22 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# The first hasher hashes new passwords, the rest only verify existing ones.
+# IMDB_PASSWORD_HASHER puts another one first, e.g. django.contrib.auth.hashers.Argon2PasswordHasher
+PASSWORD_HASHERS = [
+    'user_app.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if os.environ.get('IMDB_PASSWORD_HASHER'):
+    PASSWORD_HASHERS.insert(0, os.environ['IMDB_PASSWORD_HASHER'])
+
+# the PBKDF2 work factor. Every registration and login hashes a password on its request thread,
+# so this is what bounds their throughput per core: lowering it speeds them up at the cost of weaker hashes
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('IMDB_PASSWORD_HASH_ITERATIONS', 390000))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
@@ -141,18 +263,31 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 REST_FRAMEWORK = {
+    # orjson is used for JSON when it's installed, with identical output to the stdlib renderer
+    'DEFAULT_RENDERER_CLASSES': [
+        'movielist_app.api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'movielist_app.api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'user_app.api.authentication.CachedTokenAuthentication',
     ],
+    # counter-based throttles, whose limits are shared across workers when the default cache is
+    # a shared backend such as Redis (IMDB_CACHE_BACKEND=redis); with locmem each process counts separately
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.ScopedRateThrottle',
+        'movielist_app.api.throttling.AnonRateThrottle',
+        'movielist_app.api.throttling.UserRateThrottle',
+        'movielist_app.api.throttling.ScopedRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
         'user': '300/day',
         'review-create': '15/day',
+        'review-bulk-create': '20/day',
         'review-list': '200/day'
         },
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -0,0 +1,180 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import generics, status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from movielist_app import models
+from movielist_app.api import permissions, serializers, views
+from movielist_app.api.cache import cache_response
+from movielist_app.api.filters import MovieSearchFilter
+from movielist_app.api.pagination import MovieListPagination, ReviewListPagination
+
+
+# Async counterparts of the hot read endpoints, served without a thread per request under ASGI.
+# Writes reuse the sync views' handlers in a worker thread, so both behave identically
+
+
+class AsyncViewMixin:
+    """
+    Dispatches to coroutine handlers, awaiting authentication and throttling
+    Authenticators and throttles with an aauthenticate / aallow_request coroutine are awaited,
+        the others are run in a worker thread
+    Permissions are checked inline for reads, since they only look at the authenticated user.
+        Writes check them in a worker thread, a user's is_staff may have to be loaded first
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+        request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+
+        await self.aperform_authentication(request)
+        if request.method in SAFE_METHODS:
+            self.check_permissions(request)
+        else:
+            await sync_to_async(self.check_permissions)(request)
+        await self.acheck_throttles(request)
+
+    async def aperform_authentication(self, request):
+        try:
+            for authenticator in self.get_authenticators():
+                if hasattr(authenticator, 'aauthenticate'):
+                    user_auth = await authenticator.aauthenticate(request)
+                else:
+                    user_auth = await sync_to_async(authenticator.authenticate)(request)
+                if user_auth is not None:
+                    request._authenticator = authenticator
+                    request.user, request.auth = user_auth
+                    return
+        except Exception:
+            request._not_authenticated()
+            raise
+        request._not_authenticated()
+
+    async def acheck_throttles(self, request):
+        throttle_durations = []
+        for throttle in self.get_throttles():
+            if hasattr(throttle, 'aallow_request'):
+                allowed = await throttle.aallow_request(request, self)
+            else:
+                allowed = await sync_to_async(throttle.allow_request)(request, self)
+            if not allowed:
+                throttle_durations.append(throttle.wait())
+
+        if throttle_durations:
+            durations = [duration for duration in throttle_durations if duration is not None]
+            self.throttled(request, max(durations, default=None))
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await sync_to_async(self.paginator.paginate_queryset)(queryset, self.request, view=self)
+
+
+class AsyncAPIView(AsyncViewMixin, APIView):
+    pass
+
+
+class AsyncGenericAPIView(AsyncViewMixin, generics.GenericAPIView):
+    pass
+
+
+
+
+class ReviewList(AsyncGenericAPIView):
+    filter_backends = [DjangoFilterBackend]
+    serializer_class = serializers.ReviewSerializer
+    pagination_class = ReviewListPagination
+    filterset_fields = ['review_user__username', 'active']
+
+    @cache_response('movie:{pk}')
+    async def get(self, request, *args, **kwargs):
+        queryset = serializers.ReviewValuesSerializer.values(self.filter_queryset(self.get_queryset()))
+        page = await self.apaginate_queryset(queryset)
+        return self.get_paginated_response(serializers.ReviewValuesSerializer(page).data)
+
+    def get_queryset(self):
+        pk = self.kwargs['pk']
+        return models.Review.objects.order_by('created').filter(movie=pk)
+
+
+
+
+class StreamPlatformById(AsyncAPIView):
+    permission_classes = [permissions.IsAdminOrReadOnly]
+
+    @cache_response('platform:{pk}')
+    async def get(self, request, pk):
+        try:
+            platform = await models.StreamPlatform.objects.aget(pk=pk)
+        except models.StreamPlatform.DoesNotExist:
+            return Response({'error': 'Not Found'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = serializers.StreamPlatformSerializer(platform)
+        return Response(serializer.data)
+
+    async def put(self, request, pk):
+        return await sync_to_async(views.StreamPlatformById.put)(self, request, pk)
+
+    async def delete(self, request, pk):
+        return await sync_to_async(views.StreamPlatformById.delete)(self, request, pk)
+
+
+
+
+class MovieList(AsyncGenericAPIView):
+    queryset = models.Movie.objects.order_by('id')
+    serializer_class = serializers.MovieSerializer
+    permission_classes = [permissions.IsAdminOrReadOnly]
+    pagination_class = MovieListPagination
+    filter_backends = [MovieSearchFilter]
+    search_fields = ['title', 'storyline', 'platform__platform']
+
+    @cache_response('movies', 'platforms')
+    async def get(self, request, *args, **kwargs):
+        queryset = serializers.MovieValuesSerializer.values(self.filter_queryset(self.get_queryset()))
+        page = await self.apaginate_queryset(queryset)
+        return self.get_paginated_response(await serializers.MovieValuesSerializer(page).adata())
+
+
+
+
+class MovieById(AsyncAPIView):
+    permission_classes = [permissions.IsAdminOrReadOnly]
+
+    @cache_response('movie:{pk}', 'platforms')
+    async def get(self, request, pk):
+        movie = serializers.MovieValuesSerializer.values(models.Movie.objects.filter(pk=pk))
+        data = await serializers.MovieValuesSerializer([row async for row in movie]).adata()
+        if not data:
+            return Response({'error': 'Movie not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data[0])
+
+    async def put(self, request, pk):
+        return await sync_to_async(views.MovieById.put)(self, request, pk)
+
+    async def delete(self, request, pk):
+        return await sync_to_async(views.MovieById.delete)(self, request, pk)
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import threading
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _version_key(namespace):
+    return 'response-cache:version:' + namespace
+
+
+def get_versions(namespaces):
+    # a namespace's version changes on every write that touches it, which orphans its old entries
+    cache = get_cache()
+    keys = [_version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        versions.update(cache.get_many(missing))
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(namespaces):
+    cache = get_cache()
+    keys = [_version_key(namespace) for namespace in namespaces]
+    versions = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            await cache.aadd(key, time.time_ns(), None)
+        versions.update(await cache.aget_many(missing))
+    return [versions[key] for key in keys]
+
+
+def invalidate(*namespaces):
+    version = time.time_ns()
+    get_cache().set_many({_version_key(namespace): version for namespace in namespaces}, None)
+
+
+def invalidate_on_commit(*namespaces):
+    # bumped inside the write's transaction, a read could cache the old rows under the new version
+    # before the write commits, so writes bump the versions once they're visible
+    transaction.on_commit(lambda: invalidate(*namespaces))
+
+
+def _record(outcome):
+    with _stats_lock:
+        stats[outcome] += 1
+
+
+def get_stats():
+    with _stats_lock:
+        hits, misses = stats['hits'], stats['misses']
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else 0}
+
+
+def get_cache_key(request, versions):
+    query = sorted(request.query_params.lists())
+    raw = '%s|%s|%s' % (request.build_absolute_uri(request.path), query, versions)
+    return 'response-cache:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def get_validators(request, key, versions):
+    # versions are the write times of the namespaces, so the newest one is the last modification
+    etag = quote_etag(hashlib.sha1(('%s|%s' % (key, request.accepted_media_type)).encode()).hexdigest())
+    last_modified = max(versions) // 10 ** 9
+    return etag, last_modified
+
+
+def _resolve(namespaces, request, kwargs):
+    resolved = []
+    for namespace in namespaces:
+        if callable(namespace):
+            resolved.extend(namespace(request, **kwargs))
+        else:
+            resolved.append(namespace.format(**kwargs))
+    return resolved
+
+
+def _check(request, versions):
+    key = get_cache_key(request, versions)
+    etag, last_modified = get_validators(request, key, versions)
+    headers = {'ETag': etag, 'Last-Modified': http_date(last_modified)}
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+    return key, headers, not_modified
+
+
+def cache_response(*namespaces):
+    """
+    Cache a GET handler's response data under the given namespaces,
+        which may reference the view's url kwargs, e.g. 'movie:{pk}',
+        or be callables taking the request and url kwargs and returning a list of namespaces
+    Responses carry an ETag and Last-Modified derived from the namespace versions,
+        so conditional requests are answered with a 304 before any query or rendering
+    Coroutine handlers get a coroutine wrapper that uses the cache's async API
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            versions = get_versions(_resolve(namespaces, request, kwargs))
+            key, headers, not_modified = _check(request, versions)
+            if not_modified is not None:
+                return not_modified
+            
+            cache = get_cache()
+            data = cache.get(key)
+            if data is not None:
+                _record('hits')
+                return Response(data, headers=headers)
+            _record('misses')
+            response = method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+                for header, value in headers.items():
+                    response[header] = value
+            return response
+        
+        @wraps(method)
+        async def async_wrapper(view, request, *args, **kwargs):
+            versions = await aget_versions(_resolve(namespaces, request, kwargs))
+            key, headers, not_modified = _check(request, versions)
+            if not_modified is not None:
+                return not_modified
+            
+            cache = get_cache()
+            data = await cache.aget(key)
+            if data is not None:
+                _record('hits')
+                return Response(data, headers=headers)
+            _record('misses')
+            response = await method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+                for header, value in headers.items():
+                    response[header] = value
+            return response
+        
+        return async_wrapper if asyncio.iscoroutinefunction(method) else wrapper
+    return decorator
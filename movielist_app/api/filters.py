@@ -0,0 +1,22 @@
+from rest_framework.filters import SearchFilter
+from movielist_app import search
+
+
+# Ranked full-text search over the movie search index.
+# Falls back to SearchFilter's icontains lookups on databases without the index
+class MovieSearchFilter(SearchFilter):
+
+    # terms without any words, like "!!!", build no query and leave the queryset unfiltered and unranked
+    def is_searching(self, request):
+        return search.is_available() and bool(search.build_query(' '.join(self.get_search_terms(request))))
+
+    def filter_queryset(self, request, queryset, view):
+        if not search.is_available():
+            return super().filter_queryset(request, queryset, view)
+        return search.search(queryset, ' '.join(self.get_search_terms(request)))
+
+    # used by cursor pagination, so search results are paged in rank order
+    def get_ordering(self, request, queryset, view):
+        if self.is_searching(request):
+            return ('search_rank', 'id')
+        return view.pagination_class.ordering
@@ -1,9 +1,161 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from collections import OrderedDict
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
 
 
 
-class MovieListPagination(PageNumberPagination):
+# Seeks past the last row of the previous page instead of using OFFSET.
+# The total count is included unless the client asks for ?count=false
+#
+# CursorPagination only keys on the first ordering field and steps over its ties with an offset, so with
+# ('created', 'id') a page of reviews posted in the same instant would be re-read from the first of them.
+# The cursor here holds every ordering field, and seeks with a tuple comparison on all of them:
+# (created, id) > (x, y) is created >= x and (created > x or (created = x and id > y))
+class KeysetPagination(CursorPagination):
+    page_size_query_param = 'size'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() not in ('false', '0'):
+            self.count = queryset.count()
+
+        # CursorPagination.paginate_queryset with the seek on the whole ordering
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*[order[1:] if order.startswith('-') else '-' + order
+                                           for order in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            # a cursor can decode and still hold values its fields can't take
+            try:
+                queryset = queryset.filter(self.get_position_filter(current_position, reverse))
+            except (ValueError, TypeError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_position_filter(self, position, reverse):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        # built from the last field out, each field either passes the cursor or ties it and defers to the next
+        position_filter = None
+        for order, value in reversed(list(zip(self.ordering, values))):
+            field = order.lstrip('-')
+            lookup = '__lt' if order.startswith('-') != reverse else '__gt'
+            passed = Q(**{field + lookup: value})
+            position_filter = passed if position_filter is None else passed | Q(**{field: value}) & position_filter
+        # the OR has no bound an index can seek to, so the first field is also bounded on its own,
+        # making the seek a range on the index instead of a scan through every earlier row
+        if len(values) > 1:
+            order = self.ordering[0]
+            bound = '__lte' if order.startswith('-') != reverse else '__gte'
+            position_filter = Q(**{order.lstrip('-') + bound: values[0]}) & position_filter
+        return position_filter
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            values = [instance[order.lstrip('-')] for order in ordering]
+        else:
+            values = [getattr(instance, order.lstrip('-')) for order in ordering]
+        return json.dumps([str(value) for value in values], separators=(',', ':'))
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = OrderedDict([('count', self.count)] + list(response.data.items()))
+        return response
+
+
+class MovieListPagination(KeysetPagination):
+    page_size = 20
+    max_page_size = 40
+    ordering = 'id'
+
+
+class MovieTopPagination(KeysetPagination):
+    page_size = 20
+    max_page_size = 40
+    ordering = ('-avg_rating', '-id')
+
+
+class MovieTrendingPagination(KeysetPagination):
+    page_size = 20
+    max_page_size = 40
+    ordering = ('-trending_score', '-id')
+
+
+class MovieSnapshotPagination(KeysetPagination):
+    page_size = 20
+    max_page_size = 40
+    ordering = 'movie_id'
+
+
+class ReviewListPagination(KeysetPagination):
+    page_size = 10
+    max_page_size = 40
+    ordering = ('created', 'id')
+
+
+class ReviewsByUserPagination(KeysetPagination):
+    page_size = 10
+    max_page_size = 40
+    ordering = 'id'
+
+
+class StreamPlatformListPagination(CursorPagination):
     page_size = 20
     page_size_query_param = 'size'
     max_page_size = 40
-    
+    ordering = 'id'
@@ -0,0 +1,30 @@
+from rest_framework.renderers import JSONRenderer
+from imdb.instrumentation import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Renders with orjson when it's installed, falling back to the stdlib for anything orjson would render differently.
+# Datetimes, Decimals and lazy strings are passed to DRF's encoder so their output is unchanged
+class FastJSONRenderer(JSONRenderer):
+    options = 0 if orjson is None else orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return self.render_json(data, accepted_media_type, renderer_context)
+
+    def render_json(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -1,20 +1,38 @@
+from collections import OrderedDict
 from rest_framework import serializers
+from imdb.instrumentation import timed
 from movielist_app import models 
 
-class ReviewSerializer(serializers.ModelSerializer):
+
+class ModelSerializer(serializers.ModelSerializer):
+    
+    # each top-level object is timed, nested serializers count towards their parent's time
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+class ReviewSerializer(ModelSerializer):
     review_user = serializers.StringRelatedField(read_only=True)
     
     class Meta:
         model = models.Review
         exclude = ['movie']
 
-class MovieSerializer(serializers.ModelSerializer):
+class ReviewBulkItemSerializer(ModelSerializer):
+    movie = serializers.IntegerField(source='movie_id')
+    
+    class Meta:
+        model = models.Review
+        fields = ['movie', 'rating', 'description', 'active']
+
+class MovieSerializer(ModelSerializer):
     reviews = ReviewSerializer(many=True, read_only=True) 
     platform = serializers.CharField(source="platform.platform")
     
     class Meta:
         model = models.Movie
-        fields = "__all__"
+        exclude = ['rating_sum', 'trending_score']
+        read_only_fields = ['avg_rating', 'num_ratings']
         
     # field validator
     def validate_title(self, value):
@@ -28,11 +46,155 @@ class MovieSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Movie title must be different from movie storyline")
         return data
 
-class StreamPlatformSerializer(serializers.ModelSerializer):
+class MovieSnapshotSerializer(ModelSerializer):
+    platform = serializers.CharField(source="platform.platform")
+    
+    # read-only, so the unique_together validator (which would hide platform) isn't needed
+    class Meta:
+        model = models.Movie
+        exclude = ['rating_sum', 'trending_score']
+        validators = []
+
+class MovieStatsSerializer(ModelSerializer):
+    
+    class Meta:
+        model = models.MovieStats
+        fields = ['movie', 'num_ratings', 'avg_rating', 'histogram', 'recent_avg_rating', 'recent_num_ratings',
+                  'active_reviews', 'inactive_reviews']
+
+class StreamPlatformSerializer(ModelSerializer):
     movie = MovieSerializer(many=True, read_only=True)
     
     class Meta:
         model = models.StreamPlatform
         fields = "__all__"
 
-        
\ No newline at end of file
+
+class StreamPlatformListSerializer(ModelSerializer):
+    movie_count = serializers.SerializerMethodField()
+    movie_ids = serializers.SerializerMethodField()
+    watchlist = MovieSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = models.StreamPlatform
+        fields = ['id', 'platform', 'about', 'website', 'movie_count', 'movie_ids', 'watchlist']
+        
+    # movies are only embedded when requested via ?expand=watchlist,reviews
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = self.context.get('expand', ())
+        if 'watchlist' not in expand and 'reviews' not in expand:
+            self.fields.pop('watchlist')
+        elif 'reviews' not in expand:
+            self.fields['watchlist'].child.fields.pop('reviews')
+            
+    def get_movie_count(self, obj):
+        return len(obj.watchlist.all())
+    
+    def get_movie_ids(self, obj):
+        return [movie.id for movie in obj.watchlist.all()]
+
+
+
+
+# Read-only serializers that reproduce a ModelSerializer's output from .values() rows.
+# The output fields are compiled once per class, so rendering a row is a plain loop over tuples
+class ValuesSerializer:
+    serializer_class = None
+    # output field -> values() lookup, for fields that aren't a column of the same name
+    sources = {}
+    # nested many=True output field -> the ValuesSerializer rendering its rows
+    nested = {}
+    converters = {
+        serializers.IntegerField: int,
+        serializers.FloatField: float,
+        serializers.CharField: str,
+        serializers.BooleanField: bool,
+    }
+    
+    def __init__(self, rows):
+        self.rows = rows
+        
+    @classmethod
+    def get_compiled_fields(cls):
+        if '_compiled_fields' not in cls.__dict__:
+            compiled = []
+            for name, field in cls.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                if isinstance(field, serializers.ListSerializer):
+                    assert name in cls.nested, (
+                        "%s.nested has no ValuesSerializer for the nested field '%s'" % (cls.__name__, name))
+                    compiled.append((name, None, None))
+                    continue
+                lookup = cls.sources.get(name, field.source.replace('.', '__'))
+                compiled.append((name, lookup, cls.converters.get(type(field), field.to_representation)))
+            cls._compiled_fields = compiled
+        return cls._compiled_fields
+    
+    @classmethod
+    def values(cls, queryset, *extra):
+        lookups = [lookup for name, lookup, convert in cls.get_compiled_fields() if lookup is not None]
+        return queryset.values(*dict.fromkeys([*lookups, *extra, *queryset.query.annotations]))
+    
+    def get_nested_rows(self, name):
+        # a nested field's source is a reverse foreign key, its rows are fetched for every row at once
+        relation = self.serializer_class.Meta.model._meta.get_field(self.sources.get(name, name))
+        parent = relation.field.attname
+        ids = [row['id'] for row in self.rows]
+        queryset = relation.related_model._default_manager.filter(**{parent + '__in': ids})
+        return parent, self.nested[name].values(queryset, parent)
+    
+    def group_nested(self, name, parent, rows):
+        items = {}
+        for row, item in zip(rows, self.nested[name](rows).data):
+            items.setdefault(row[parent], []).append(item)
+        return items
+    
+    # nested many=True fields, as {parent id: [child, ...]}
+    def get_nested(self, name):
+        if not self.rows:
+            return {}
+        parent, rows = self.get_nested_rows(name)
+        return self.group_nested(name, parent, list(rows))
+    
+    async def aget_nested(self, name):
+        if not self.rows:
+            return {}
+        parent, rows = self.get_nested_rows(name)
+        return self.group_nested(name, parent, [row async for row in rows])
+    
+    @property
+    def data(self):
+        with timed('serialize'):
+            fields = self.get_compiled_fields()
+            return self.render_rows({name: self.get_nested(name) for name, lookup, convert in fields if lookup is None})
+    
+    # the same as .data, for async views, with nested fields fetched through the async ORM
+    async def adata(self):
+        with timed('serialize'):
+            fields = self.get_compiled_fields()
+            return self.render_rows(
+                {name: await self.aget_nested(name) for name, lookup, convert in fields if lookup is None})
+    
+    def render_rows(self, nested):
+        fields = self.get_compiled_fields()
+        data = []
+        for row in self.rows:
+            item = OrderedDict()
+            for name, lookup, convert in fields:
+                if lookup is None:
+                    item[name] = nested[name].get(row['id'], [])
+                else:
+                    value = row[lookup]
+                    item[name] = None if value is None else convert(value)
+            data.append(item)
+        return data
+
+class ReviewValuesSerializer(ValuesSerializer):
+    serializer_class = ReviewSerializer
+    sources = {'review_user': 'review_user__username'}
+
+class MovieValuesSerializer(ValuesSerializer):
+    serializer_class = MovieSerializer
+    nested = {'reviews': ReviewValuesSerializer}
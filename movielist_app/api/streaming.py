@@ -0,0 +1,33 @@
+from itertools import islice
+from django.http import StreamingHttpResponse
+from movielist_app.api.renderers import FastJSONRenderer
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def render_json_array(queryset, values_serializer_class, chunk_size):
+    # each chunk is rendered as a JSON array and spliced in without its brackets
+    renderer = FastJSONRenderer()
+    yield b'['
+    separator = b''
+    for chunk in chunked(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        yield separator + renderer.render(values_serializer_class(chunk).data)[1:-1]
+        separator = b','
+    yield b']'
+
+
+def streaming_json_response(queryset, values_serializer_class, chunk_size=500):
+    """
+    Stream a .values() queryset as one JSON array, a chunk of rows at a time,
+        so memory use doesn't grow with the number of rows
+    """
+    rows = values_serializer_class.values(queryset)
+    return StreamingHttpResponse(render_json_array(rows, values_serializer_class, chunk_size),
+                                 content_type='application/json')
@@ -1,7 +1,122 @@
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+from rest_framework import throttling
+from imdb.instrumentation import timed
+
+
+class CounterRateThrottle(throttling.SimpleRateThrottle):
+    """
+    Counts requests per window with an atomic cache increment instead of storing every timestamp,
+        so each client costs one integer per window however high the rate is
+    The sliding window weights the previous window's count by how much of it still overlaps,
+        set sliding = False for plain fixed windows
+    Limits are shared by every worker process that uses the same cache
+    """
+    sliding = True
+
+    def get_window_keys(self):
+        window = int(self.now // self.duration)
+        return '%s:%d' % (self.key, window), '%s:%d' % (self.key, window - 1)
+
+    def prepare(self, request, view):
+        if self.rate is None:
+            return False
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return False
+        self.now = self.timer()
+        self.elapsed = self.now % self.duration
+        self.current_key, self.previous_key = self.get_window_keys()
+        return True
+
+    def weigh(self, count, previous):
+        self.count, self.previous = count, previous
+        weighted = count
+        if self.sliding:
+            weighted += previous * (1 - self.elapsed / self.duration)
+        return weighted <= self.num_requests
+
+    def allow_request(self, request, view):
+        with timed('throttle'):
+            return self.count_request(request, view)
+
+    async def aallow_request(self, request, view):
+        with timed('throttle'):
+            return await self.acount_request(request, view)
+
+    def count_request(self, request, view):
+        if not self.prepare(request, view):
+            return True
+        # a window's counter outlives it by one window, for the sliding estimate of the next one
+        self.cache.add(self.current_key, 0, self.duration * 2)
+        try:
+            count = self.cache.incr(self.current_key)
+        except ValueError:
+            # evicted between add and incr
+            self.cache.set(self.current_key, 1, self.duration * 2)
+            count = 1
+        previous = self.cache.get(self.previous_key, 0) if self.sliding else 0
+        if not self.weigh(count, previous):
+            # rejected requests don't use up the allowance
+            self.cache.decr(self.current_key)
+            self.count -= 1
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    async def acount_request(self, request, view):
+        if not self.prepare(request, view):
+            return True
+        await self.cache.aadd(self.current_key, 0, self.duration * 2)
+        try:
+            count = await self.cache.aincr(self.current_key)
+        except ValueError:
+            await self.cache.aset(self.current_key, 1, self.duration * 2)
+            count = 1
+        previous = await self.cache.aget(self.previous_key, 0) if self.sliding else 0
+        if not self.weigh(count, previous):
+            await self.cache.adecr(self.current_key)
+            self.count -= 1
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        remaining = self.duration - self.elapsed
+        if not self.sliding:
+            return remaining
+        available = self.num_requests - self.count - 1
+        if available >= 0 and self.previous:
+            # the previous window's share shrinks until the request fits
+            return max(0, self.duration * (1 - available / self.previous) - self.elapsed)
+        # this window is full, and its share of the next one has to shrink in turn
+        if not self.count:
+            return remaining
+        return remaining + self.duration * max(0, 1 - (self.num_requests - 1) / self.count)
+
+
+class AnonRateThrottle(CounterRateThrottle, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(CounterRateThrottle, throttling.UserRateThrottle):
+    pass
+
+
+class ScopedRateThrottle(CounterRateThrottle, throttling.ScopedRateThrottle):
+
+    # the scope comes from the view, so the rate can only be looked up once it's called
+    def prepare(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return False
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().prepare(request, view)
+
 
 class ReviewCreateThrottle(UserRateThrottle):
     scope = 'review-create'
-    
-    
-    
\ No newline at end of file
+
+
+class ReviewBulkCreateThrottle(UserRateThrottle):
+    scope = 'review-bulk-create'
@@ -1,17 +1,32 @@
+from django.conf import settings
 from django.urls import path
-from movielist_app.api import views
+from movielist_app.api import async_views, views
+
+
+# the hot read endpoints are served by their async counterparts when running under ASGI
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
 
 
 urlpatterns = [
-    path('list/', views.MovieList.as_view(), name='movie-list'),
-    path('<int:pk>/', views.MovieById.as_view(), name='movie-detail'),
+    path('list/', read_views.MovieList.as_view(), name='movie-list'),
+    path('list/compact/', views.MovieSnapshotList.as_view(), name='movie-list-compact'),
+    path('<int:pk>/', read_views.MovieById.as_view(), name='movie-detail'),
+    path('batch/', views.MovieBatch.as_view(), name='movie-batch'),
+    path('top/', views.MovieTop.as_view(), name='movie-top'),
+    path('trending/', views.MovieTrending.as_view(), name='movie-trending'),
+    path('<int:pk>/stats/', views.MovieStatsById.as_view(), name='movie-stats'),
+    path('stats/', views.MovieStatsBatch.as_view(), name='movie-stats-batch'),
         
     path('stream/list/', views.StreamPlatformList.as_view(), name='stream-list' ),
-    path('stream/<int:pk>/', views.StreamPlatformById.as_view(), name='stream-detail' ),
+    path('stream/<int:pk>/', read_views.StreamPlatformById.as_view(), name='stream-detail' ),
     
-    path('<int:pk>/review/', views.ReviewList.as_view(), name='reviews-for-movie'),
+    path('<int:pk>/review/', read_views.ReviewList.as_view(), name='reviews-for-movie'),
     path('review/<int:pk>/', views.ReviewById.as_view(), name='review-detail'),
         
     path('<int:pk>/review-create/', views.ReviewCreate.as_view(), name='review-create'),
-    path('reviews/<str:username>/', views.ReviewsByUser.as_view(), name='reviews-by-user')
+    path('review-bulk-create/', views.ReviewBulkCreate.as_view(), name='review-bulk-create'),
+    path('reviews/<str:username>/', views.ReviewsByUser.as_view(), name='reviews-by-user'),
+    
+    path('cache-stats/', views.CacheStats.as_view(), name='cache-stats'),
+    path('metrics/', views.Metrics.as_view(), name='metrics'),
 ]
@@ -1,24 +1,61 @@
+from django.db import IntegrityError, transaction
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import generics, status, filters
+from rest_framework import generics, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from movielist_app import models
-from movielist_app.api.pagination import MovieListPagination
+from imdb.instrumentation import get_metrics
+from movielist_app import models, ratings, snapshots
+from movielist_app.api.pagination import (MovieListPagination, MovieSnapshotPagination, MovieTopPagination,
+                                          MovieTrendingPagination, ReviewListPagination, ReviewsByUserPagination,
+                                          StreamPlatformListPagination)
 from movielist_app.api import permissions, serializers, throttling
+from movielist_app.api.filters import MovieSearchFilter
+from movielist_app.api.cache import cache_response, get_stats, invalidate_on_commit
+from movielist_app.api.streaming import streaming_json_response
+
+
+# the most digits an id can have and still fit a 64 bit primary key
+MAX_ID_DIGITS = 18
+
+
+def get_requested_ids(request, max_ids):
+    # ?ids=1,2,3, in the order given and without repeats
+    ids = {}
+    for value in request.query_params.get('ids', '').split(','):
+        value = value.strip()
+        if not value:
+            continue
+        # str.isdigit also accepts other scripts' digits and superscripts
+        if not (value.isascii() and value.isdigit() and len(value) <= MAX_ID_DIGITS):
+            raise ValidationError({'ids': ["Expected a comma separated list of movie ids"]})
+        ids[int(value)] = None
+        if len(ids) > max_ids:
+            raise ValidationError({'ids': ["At most %d movies can be requested at once" % max_ids]})
+    if not ids:
+        raise ValidationError({'ids': ["Expected a comma separated list of movie ids"]})
+    return list(ids)
+
+
 
 
 class ReviewsByUser(generics.ListAPIView):    
     serializer_class = serializers.ReviewSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = ReviewsByUserPagination
     
     def get_queryset(self):
-        queryset = models.Review.objects.get_queryset().order_by('id')
-        username = self.request.query_params.get('username')
-        if username is not None:
-            queryset = queryset.filter(review_user__username=username)
-        return queryset
+        username = self.kwargs['username']
+        return models.Review.objects.filter(review_user__username=username).order_by('id')
+    
+    # ?stream=true exports every review as one streamed JSON array instead of a page
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('stream', '').lower() in ('true', '1'):
+            return streaming_json_response(self.get_queryset(), serializers.ReviewValuesSerializer)
+        queryset = serializers.ReviewValuesSerializer.values(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serializers.ReviewValuesSerializer(page).data)
 
 
 
@@ -35,19 +72,103 @@ class ReviewCreate(generics.CreateAPIView):
         pk = self.kwargs.get('pk')
         movie = models.Movie.objects.get(pk=pk)
         review_user = self.request.user
-        review_queryset = models.Review.objects.filter(movie=movie, review_user = review_user)
         
-        if review_queryset.exists():
+        # the unique_review_per_user constraint rejects duplicates, even from concurrent requests
+        try:
+            with transaction.atomic():
+                serializer.save(movie=movie, review_user=review_user)
+        except IntegrityError:
             raise ValidationError("You have already reviewed this movie")
-               
-        if movie.num_ratings == 0:
-            movie.avg_rating = serializer.validated_data['rating']
-        else:
-             movie.avg_rating = ((movie.avg_rating + serializer.validated_data['rating']) / 2)
+
+
+
+
+class ReviewBulkCreate(generics.GenericAPIView):
+    serializer_class = serializers.ReviewBulkItemSerializer
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [throttling.ReviewBulkCreateThrottle]
+    max_batch_size = 1000
+    
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError("Expected a list of reviews")
+        if len(items) > self.max_batch_size:
+            raise ValidationError("A batch can contain at most %d reviews" % self.max_batch_size)
+        
+        # validate every item up front so one bad review doesn't abort the batch
+        serializer = self.get_serializer()
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            try:
+                valid.append((index, serializer.run_validation(item)))
+            except ValidationError as exc:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': exc.detail}
         
-        movie.num_ratings = movie.num_ratings + 1
-        movie.save()
-        serializer.save(movie=movie, review_user=review_user)
+        pending = self.check_conflicts(valid, results)
+        
+        # the checks race other requests, so the constraints have the final say. A batch that breaks one is
+        # rolled back to its savepoint and checked again, and whatever now conflicts is reported per item
+        while True:
+            try:
+                created, totals = self.create_reviews(pending)
+                break
+            except IntegrityError:
+                remaining = self.check_conflicts(pending, results)
+                if len(remaining) == len(pending):
+                    raise
+                pending = remaining
+        
+        if totals:
+            snapshots.refresh(*totals)
+            invalidate_on_commit('movies', *['movie:%s' % movie_id for movie_id in totals])
+        
+        for index, review in created:
+            results[index] = {'index': index, 'status': 'created', 'id': review.id}
+        
+        if len(created) == len(items):
+            return Response(results, status=status.HTTP_201_CREATED)
+        return Response(results, status=status.HTTP_207_MULTI_STATUS)
+    
+    def get_reviewed_movies(self, movie_ids):
+        return set(models.Review.objects.filter(review_user=self.request.user, movie__in=movie_ids)
+                   .values_list('movie_id', flat=True))
+    
+    def check_conflicts(self, valid, results):
+        # missing and already reviewed movies are found with one query each, and reported in results
+        movie_ids = {data['movie_id'] for index, data in valid}
+        existing_movies = set(models.Movie.objects.filter(pk__in=movie_ids).values_list('id', flat=True))
+        reviewed = self.get_reviewed_movies(movie_ids)
+        
+        pending = []
+        for index, data in valid:
+            if data['movie_id'] not in existing_movies:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': {'movie': ["Movie not found"]}}
+            elif data['movie_id'] in reviewed:
+                results[index] = {'index': index, 'status': 'duplicate', 'errors': {'movie': ["You have already reviewed this movie"]}}
+            else:
+                reviewed.add(data['movie_id'])
+                pending.append((index, data))
+        return pending
+    
+    def create_reviews(self, pending):
+        created = [(index, models.Review(review_user=self.request.user, **data)) for index, data in pending]
+        # bulk_create skips the review signals, so the aggregates are applied once per movie here
+        totals = {}
+        with transaction.atomic():
+            models.Review.objects.bulk_create([review for index, review in created])
+            for index, review in created:
+                rating_sum, count, trending, stats_changes = totals.get(review.movie_id, (0, 0, ratings.LogDelta(), {}))
+                totals[review.movie_id] = (
+                    rating_sum + review.rating, count + 1,
+                    trending + ratings.LogDelta.of(ratings.trending_exponent(review.created)),
+                    ratings.merge_changes(stats_changes,
+                                          ratings.get_stats_changes(review.rating, review.active, review.created)),
+                )
+            for movie_id, changes in totals.items():
+                ratings.update_rating(movie_id, *changes)
+        return created, totals
 
 
 
@@ -55,8 +176,15 @@ class ReviewCreate(generics.CreateAPIView):
 class ReviewList(generics.ListAPIView):
     filter_backends = [DjangoFilterBackend]
     serializer_class = serializers.ReviewSerializer
+    pagination_class = ReviewListPagination
     filterset_fields = ['review_user__username', 'active']
     
+    @cache_response('movie:{pk}')
+    def get(self, request, *args, **kwargs):
+        queryset = serializers.ReviewValuesSerializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serializers.ReviewValuesSerializer(page).data)
+    
     def get_queryset(self):
         pk = self.kwargs['pk']
         return models.Review.objects.order_by('created').filter(movie=pk) 
@@ -67,14 +195,31 @@ class ReviewList(generics.ListAPIView):
     
 class ReviewById(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.ReviewUserOrReadOnly]
-    queryset = models.Review.objects.get_queryset().order_by('id')
+    queryset = models.Review.objects.select_related('review_user').order_by('id')
     serializer_class = serializers.ReviewSerializer  
+    
+    def get_queryset(self):
+        # writes lock the review as they load it, so a concurrent edit can't change the rating
+        # the signals take back out of the movie's aggregates
+        if self.request.method in ('PUT', 'PATCH', 'DELETE'):
+            return self.queryset.select_for_update(of=('self',))
+        return self.queryset
+    
+    # the movie's rating aggregates are updated by signals in the same transaction
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+    
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().destroy(request, *args, **kwargs)
 
     
     
 class StreamPlatformById(APIView):
     permission_classes = [permissions.IsAdminOrReadOnly]
     
+    @cache_response('platform:{pk}')
     def get(self, request, pk):
         try:
             platform = models.StreamPlatform.objects.get(pk=pk)
@@ -103,10 +248,14 @@ class StreamPlatformById(APIView):
 class StreamPlatformList(APIView):
     permission_classes = [permissions.IsAdminOrReadOnly]
     
+    @cache_response('platforms', 'movies')
     def get(self, request):
-        platform = models.StreamPlatform.objects.get_queryset().order_by('id')
-        serializer = serializers.StreamPlatformSerializer(platform, many=True)
-        return Response(serializer.data)
+        expand = [field.strip() for field in request.query_params.get('expand', '').split(',')]
+        platform = models.StreamPlatform.objects.with_watchlist(expand).order_by('id')
+        paginator = StreamPlatformListPagination()
+        page = paginator.paginate_queryset(platform, request, view=self)
+        serializer = serializers.StreamPlatformListSerializer(page, many=True, context={'expand': expand})
+        return paginator.get_paginated_response(serializer.data)
     
     def post(self, request):
         serializer = serializers.StreamPlatformSerializer(data=request.data)
@@ -120,29 +269,75 @@ class StreamPlatformList(APIView):
 
 
 class MovieList(generics.ListAPIView):
-    queryset = models.Movie.objects.get_queryset().order_by('id')
+    queryset = models.Movie.objects.order_by('id')
     serializer_class = serializers.MovieSerializer
     permission_classes = [permissions.IsAdminOrReadOnly]
     pagination_class = MovieListPagination
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'platform__platform']
+    filter_backends = [MovieSearchFilter]
+    search_fields = ['title', 'storyline', 'platform__platform']
+    
+    # rendered from .values() rows by MovieValuesSerializer, which matches MovieSerializer's output
+    @cache_response('movies', 'platforms')
+    def get(self, request, *args, **kwargs):
+        queryset = serializers.MovieValuesSerializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serializers.MovieValuesSerializer(page).data)
+    
+
+
+
+class MovieTop(generics.ListAPIView):
+    queryset = models.Movie.objects.filter(num_ratings__gt=0)
+    serializer_class = serializers.MovieSerializer
+    permission_classes = [permissions.IsAdminOrReadOnly]
+    pagination_class = MovieTopPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['platform']
+    
+    # the rankings are maintained with the rating aggregates, and each page is read off an index
+    @cache_response('movies', 'platforms')
+    def get(self, request, *args, **kwargs):
+        # the cursor is read from the ranking columns, which aren't part of the output
+        ranking = [field.lstrip('-') for field in self.pagination_class.ordering]
+        queryset = serializers.MovieValuesSerializer.values(self.filter_queryset(self.get_queryset()), *ranking)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serializers.MovieValuesSerializer(page).data)
+
+
+class MovieTrending(MovieTop):
+    queryset = models.Movie.objects.filter(num_ratings__gt=0)
+    pagination_class = MovieTrendingPagination
+
+
+
+
+class MovieSnapshotList(generics.GenericAPIView):
+    queryset = models.MovieSnapshot.objects.values('movie_id', 'data')
+    permission_classes = [permissions.IsAdminOrReadOnly]
+    pagination_class = MovieSnapshotPagination
     
+    # rows are already serialized, so a page is one indexed query with no joins
+    @cache_response('movies', 'platforms')
+    def get(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response([row['data'] for row in page])
+
 
 
 
 class MovieById(APIView):
     permission_classes = [permissions.IsAdminOrReadOnly]
     
+    @cache_response('movie:{pk}', 'platforms')
     def get(self, request, pk):
-        try:
-            movie = models.Movie.objects.get(pk=pk)
-        except models.Movie.DoesNotExist:
+        movie = serializers.MovieValuesSerializer.values(models.Movie.objects.filter(pk=pk))
+        data = serializers.MovieValuesSerializer(movie).data
+        if not data:
             return Response({'error': 'Movie not found'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = serializers.MovieSerializer(movie)
-        return Response(serializer.data)
+        return Response(data[0])
     
     def put(self, request, pk):
-        movie = models.Movie.objects.get(pk=pk)
+        movie = models.Movie.objects.with_related().get(pk=pk)
         #serializer = serializers.MovieSerializer(movie, data=request.data)
         serializer = serializers.MovieSerializer(movie, data=request.data, partial=True)
         if serializer.is_valid():
@@ -156,6 +351,70 @@ class MovieById(APIView):
         movie = models.Movie.objects.get(pk=pk)
         movie.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+
+
+# only writes to the requested movies invalidate a batch
+def get_batch_namespaces(request):
+    return ['movie:%d' % pk for pk in get_requested_ids(request, MovieBatch.max_batch_size)]
+
+
+class MovieBatch(APIView):
+    permission_classes = [permissions.IsAdminOrReadOnly]
+    max_batch_size = 50
     
+    # the same rows as MovieById, for every requested movie in two queries
+    @cache_response(get_batch_namespaces, 'platforms')
+    def get(self, request):
+        ids = get_requested_ids(request, self.max_batch_size)
+        movies = serializers.MovieValuesSerializer.values(models.Movie.objects.filter(pk__in=ids))
+        found = {movie['id']: movie for movie in serializers.MovieValuesSerializer(list(movies)).data}
+        return Response({'results': [found.get(pk, {'id': pk, 'error': 'Movie not found'}) for pk in ids]})
 
 
+
+
+class MovieStatsById(APIView):
+    permission_classes = [permissions.IsAdminOrReadOnly]
+    
+    # the counters are maintained with the rating aggregates, so this is a primary key read
+    @cache_response('movie:{pk}')
+    def get(self, request, pk):
+        try:
+            stats = models.MovieStats.objects.get(pk=pk)
+        except models.MovieStats.DoesNotExist:
+            return Response({'error': 'Movie not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serializers.MovieStatsSerializer(stats).data)
+
+
+class MovieStatsBatch(APIView):
+    permission_classes = [permissions.IsAdminOrReadOnly]
+    max_batch_size = 100
+    
+    @cache_response('movies')
+    def get(self, request):
+        ids = get_requested_ids(request, self.max_batch_size)
+        stats = models.MovieStats.objects.in_bulk(ids)
+        return Response({'results': [
+            serializers.MovieStatsSerializer(stats[pk]).data if pk in stats else {'movie': pk, 'error': 'Movie not found'}
+            for pk in ids
+        ]})
+
+
+
+
+class CacheStats(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(get_stats())
+
+
+
+
+class Metrics(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(get_metrics())
@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from imdb import db
 
 
 class WatchlistAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'movielist_app'
+
+    def ready(self):
+        connection_created.connect(db.configure_connection, dispatch_uid='imdb.db.configure_connection')
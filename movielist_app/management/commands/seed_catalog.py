@@ -0,0 +1,199 @@
+import argparse
+import contextlib
+import datetime
+import itertools
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.authtoken.models import Token
+
+from movielist_app import models, ratings, search, snapshots
+
+PASSWORD = 'password@123'
+
+# the review dates count back from a fixed moment, so the same --seed always generates the same dates
+DEFAULT_NOW = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def chunks(stop, size):
+    for first in range(0, stop, size):
+        yield range(first, min(first + size, stop))
+
+
+def aware_datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise argparse.ArgumentTypeError("Expected an ISO 8601 date and time, e.g. 2026-01-01T00:00:00Z")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, datetime.timezone.utc)
+
+
+def zipf_weights(count, skew):
+    return [1 / rank ** skew for rank in range(1, count + 1)]
+
+
+@contextlib.contextmanager
+def generated_dates():
+    # auto_now_add would overwrite the generated review dates
+    fields = [models.Review._meta.get_field(name) for name in ('created', 'update')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextlib.contextmanager
+def deferred_indexes(*model_classes):
+    # building an index once at the end is much cheaper than maintaining it through every insert.
+    # Unique constraints are kept, they're what stops duplicate reviews. SQLite can't alter the schema inside
+    # a transaction, so the indexes are only deferred when the caller hasn't opened one
+    if connection.vendor == 'sqlite' and connection.in_atomic_block:
+        yield
+        return
+    indexes = [(model, index) for model in model_classes for index in model._meta.indexes]
+    with connection.schema_editor() as editor:
+        for model, index in indexes:
+            editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill an empty catalog with generated platforms, users, movies and reviews. "
+        "The same --seed always generates the same data. Movie popularity and platform sizes follow "
+        "a Zipf distribution, so a few movies get most of the reviews and the rest form a long tail. "
+        "Users are named user<n> and share the password '%s'." % PASSWORD
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--platforms', type=int, default=100)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--movies', type=int, default=100000)
+        parser.add_argument('--reviews', type=int, default=1000000, help='approximate, see --skew')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--skew', type=float, default=1.0,
+                            help='Zipf exponent of movie popularity and platform size, 0 for uniform')
+        parser.add_argument('--days', type=int, default=365, help='reviews are spread over this many past days')
+        parser.add_argument('--now', type=aware_datetime, default=DEFAULT_NOW,
+                            help='the moment the review dates count back from, UTC unless given. Defaults to %s'
+                                 % DEFAULT_NOW.isoformat())
+        parser.add_argument('--chunk-size', type=int, default=5000, help='movies per transaction')
+        parser.add_argument('--keep-indexes', action='store_true',
+                            help="maintain the indexes during the inserts instead of building them afterwards")
+
+    def handle(self, *args, **options):
+        if models.Movie.objects.exists() or User.objects.filter(username__startswith='user').exists():
+            raise CommandError("The catalog isn't empty, seed a fresh database")
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        self.now = options['now']
+        started = time.perf_counter()
+
+        platform_ids = self.create_platforms()
+        user_ids = self.create_users()
+        indexes = contextlib.nullcontext() if options['keep_indexes'] else deferred_indexes(models.Movie, models.Review)
+        with indexes:
+            reviews = self.create_movies(platform_ids, user_ids)
+        search.rebuild()
+
+        self.stdout.write(self.style.SUCCESS('Seeded %d platforms, %d users, %d movies and %d reviews in %.1fs' % (
+            len(platform_ids), len(user_ids), options['movies'], reviews, time.perf_counter() - started)))
+
+    def create_platforms(self):
+        with transaction.atomic():
+            models.StreamPlatform.objects.bulk_create([
+                models.StreamPlatform(platform='Platform %d' % i, about='Streaming platform %d' % i,
+                                      website='https://platform%d.example.com' % i)
+                for i in range(self.options['platforms'])
+            ])
+        return list(models.StreamPlatform.objects.order_by('id').values_list('id', flat=True))
+
+    def create_users(self):
+        # one hash for everyone, hashing per user would take longer than everything else
+        password = make_password(PASSWORD)
+        for chunk in chunks(self.options['users'], self.options['chunk_size']):
+            with transaction.atomic():
+                users = User.objects.bulk_create([User(username='user%d' % i, password=password) for i in chunk])
+                Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users])
+        return list(User.objects.filter(username__startswith='user').order_by('id').values_list('id', flat=True))
+
+    def create_movies(self, platform_ids, user_ids):
+        options = self.options
+        if not platform_ids and options['movies']:
+            raise CommandError("Movies need at least one platform")
+        # a movie's share of the reviews follows its popularity rank, and the ranks are shuffled across ids
+        popularity = zipf_weights(options['movies'], options['skew'])
+        self.rng.shuffle(popularity)
+        scale = options['reviews'] / sum(popularity) if popularity else 0
+        platform_weights = list(itertools.accumulate(zipf_weights(len(platform_ids), options['skew'])))
+
+        total = 0
+        for chunk in chunks(options['movies'], options['chunk_size']):
+            started = time.perf_counter()
+            platforms = self.rng.choices(platform_ids, cum_weights=platform_weights, k=len(chunk))
+            movies = []
+            for i, platform_id in zip(chunk, platforms):
+                expected = popularity[i] * scale
+                count = min(len(user_ids), int(expected) + (self.rng.random() < expected % 1))
+                movie = models.Movie(title='Movie %d' % i, storyline='The story of movie %d' % i, platform_id=platform_id)
+                movie.generated_reviews = self.generate_reviews(i, user_ids, count)
+                movies.append(movie)
+            total += self.insert(movies)
+            self.stdout.write('%d movies, %d reviews (%.0f reviews/s)' % (
+                chunk.stop, total, sum(len(movie.generated_reviews) for movie in movies) / (time.perf_counter() - started)))
+        return total
+
+    def generate_reviews(self, i, user_ids, count):
+        # each movie has its own quality, so averages spread out instead of all being 3
+        quality = self.rng.uniform(1.5, 4.8)
+        seconds = self.options['days'] * 24 * 3600
+        return [
+            models.Review(
+                review_user_id=user_id,
+                rating=min(5, max(1, round(self.rng.gauss(quality, 1)))),
+                description='Review of movie %d' % i,
+                active=self.rng.random() < 0.95,
+                created=created,
+                update=created,
+            )
+            for user_id, created in zip(
+                self.rng.sample(user_ids, count),
+                [self.now - datetime.timedelta(seconds=self.rng.randrange(seconds)) for i in range(count)],
+            )
+        ]
+
+    def insert(self, movies):
+        # the aggregates are computed from the generated reviews, as the review signals would have
+        for movie in movies:
+            reviews = movie.generated_reviews
+            movie.rating_sum = sum(review.rating for review in reviews)
+            movie.num_ratings = len(reviews)
+            movie.avg_rating = movie.rating_sum / movie.num_ratings if reviews else 0.0
+            movie.trending_score = ratings.get_trending_score(reviews)
+
+        with transaction.atomic():
+            models.Movie.objects.bulk_create(movies)
+            stats = []
+            for movie in movies:
+                stats.append(models.MovieStats(movie_id=movie.pk, **ratings.get_stats(movie.generated_reviews)))
+                for review in movie.generated_reviews:
+                    review.movie_id = movie.pk
+            models.MovieStats.objects.bulk_create(stats)
+            reviews = [review for movie in movies for review in movie.generated_reviews]
+            with generated_dates():
+                models.Review.objects.bulk_create(reviews, batch_size=self.options['chunk_size'])
+            snapshots.refresh(*[movie.pk for movie in movies])
+        return len(reviews)
@@ -0,0 +1,31 @@
+# Generated by Django 4.1.1 on 2026-10-18 15:38
+
+from django.db import migrations, models
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Movie = apps.get_model('movielist_app', 'Movie')
+    Review = apps.get_model('movielist_app', 'Review')
+    totals = Review.objects.values('movie').annotate(total=models.Sum('rating'), count=models.Count('id'))
+    for row in totals:
+        Movie.objects.filter(pk=row['movie']).update(
+            rating_sum=row['total'],
+            num_ratings=row['count'],
+            avg_rating=row['total'] / row['count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movielist_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
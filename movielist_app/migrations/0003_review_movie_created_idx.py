@@ -0,0 +1,17 @@
+# Generated by Django 4.1.1 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movielist_app', '0002_movie_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', 'created', 'id'], name='review_movie_created_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.1.1 on 2026-10-18 15:45
+
+from django.db import migrations, models
+
+
+def remove_duplicate_reviews(apps, schema_editor):
+    # keep each user's first review of a movie and rebuild the aggregates of the movies that had duplicates
+    Movie = apps.get_model('movielist_app', 'Movie')
+    Review = apps.get_model('movielist_app', 'Review')
+    duplicates = (Review.objects.values('movie', 'review_user')
+                  .annotate(first=models.Min('id'), count=models.Count('id')).filter(count__gt=1))
+    movie_ids = set()
+    for row in duplicates:
+        Review.objects.filter(movie=row['movie'], review_user=row['review_user']).exclude(id=row['first']).delete()
+        movie_ids.add(row['movie'])
+    for movie_id in movie_ids:
+        totals = Review.objects.filter(movie=movie_id).aggregate(total=models.Sum('rating'), count=models.Count('id'))
+        Movie.objects.filter(pk=movie_id).update(
+            rating_sum=totals['total'],
+            num_ratings=totals['count'],
+            avg_rating=totals['total'] / totals['count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movielist_app', '0003_review_movie_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('active', True)), fields=['movie', 'created', 'id'], name='review_active_movie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['review_user', 'id'], name='review_user_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_reviews, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('movie', 'review_user'), name='unique_review_per_user'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE movielist_app_movie_search USING fts5("
+        "title, storyline, platform, tokenize='unicode61', prefix='2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO movielist_app_movie_search (rowid, title, storyline, platform) "
+        "SELECT movie.id, movie.title, movie.storyline, platform.platform "
+        "FROM movielist_app_movie movie INNER JOIN movielist_app_streamplatform platform "
+        "ON platform.id = movie.platform_id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE movielist_app_movie_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movielist_app', '0004_review_indexes_and_unique_review'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
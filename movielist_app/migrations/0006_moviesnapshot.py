@@ -0,0 +1,42 @@
+# Generated by Django 4.1.1 on 2026-10-18 15:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+from rest_framework.fields import DateTimeField
+
+
+def build_snapshots(apps, schema_editor):
+    Movie = apps.get_model('movielist_app', 'Movie')
+    MovieSnapshot = apps.get_model('movielist_app', 'MovieSnapshot')
+    created = DateTimeField()
+    MovieSnapshot.objects.bulk_create([
+        MovieSnapshot(movie_id=movie.id, data={
+            'id': movie.id,
+            'platform': movie.platform.platform,
+            'title': movie.title,
+            'storyline': movie.storyline,
+            'active': movie.active,
+            'avg_rating': movie.avg_rating,
+            'num_ratings': movie.num_ratings,
+            'created': created.to_representation(movie.created),
+        })
+        for movie in Movie.objects.select_related('platform').iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movielist_app', '0005_movie_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieSnapshot',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='movielist_app.movie')),
+                ('data', models.JSONField()),
+            ],
+        ),
+        migrations.RunPython(build_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.1 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movielist_app', '0006_moviesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('num_ratings__gt', 0)), fields=['-avg_rating', '-id'], name='movie_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('num_ratings__gt', 0)), fields=['platform', '-avg_rating', '-id'], name='movie_platform_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('trending_score__gt', 0)), fields=['-trending_score', '-id'], name='movie_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('trending_score__gt', 0)), fields=['platform', '-trending_score', '-id'], name='movie_platform_trending_idx'),
+        ),
+    ]
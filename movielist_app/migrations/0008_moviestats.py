@@ -0,0 +1,47 @@
+# Generated by Django 4.1.1 on 2026-10-18 16:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_reviews(apps, schema_editor):
+    # the same counters as movielist_app.ratings.get_stats_changes, the recent sums are left to 0009
+    Movie = apps.get_model('movielist_app', 'Movie')
+    MovieStats = apps.get_model('movielist_app', 'MovieStats')
+    Review = apps.get_model('movielist_app', 'Review')
+    stats = {movie_id: MovieStats(movie_id=movie_id) for movie_id in Movie.objects.values_list('id', flat=True)}
+    for movie_id, rating, active in Review.objects.values_list('movie_id', 'rating', 'active').iterator():
+        movie_stats = stats[movie_id]
+        field = 'rating_%d' % rating
+        setattr(movie_stats, field, getattr(movie_stats, field) + 1)
+        if active:
+            movie_stats.active_reviews += 1
+        else:
+            movie_stats.inactive_reviews += 1
+    MovieStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movielist_app', '0007_movie_rankings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieStats',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='movielist_app.movie')),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+                ('active_reviews', models.PositiveIntegerField(default=0)),
+                ('inactive_reviews', models.PositiveIntegerField(default=0)),
+                ('recent_rating_sum', models.FloatField(default=0)),
+                ('recent_weight', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_reviews, migrations.RunPython.noop),
+    ]
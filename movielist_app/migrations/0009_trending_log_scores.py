@@ -0,0 +1,62 @@
+# Generated by Django 4.1.1 on 2026-10-18 21:40
+
+import datetime
+import math
+from django.conf import settings
+from django.db import migrations, models
+
+
+def log_add(total, exponent):
+    # log2(2 ** total + 2 ** exponent), as movielist_app.ratings.log_sum
+    if total is None:
+        return exponent
+    return max(total, exponent) + math.log2(1 + 2.0 ** -abs(total - exponent))
+
+
+def score_reviews(apps, schema_editor):
+    # the trending scores and recent sums as movielist_app.ratings keeps them, the log2 of the summed weights
+    Movie = apps.get_model('movielist_app', 'Movie')
+    MovieStats = apps.get_model('movielist_app', 'MovieStats')
+    Review = apps.get_model('movielist_app', 'Review')
+    epoch = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+    scores = {}
+    rating_sums = {}
+    for movie_id, rating, created in Review.objects.values_list('movie_id', 'rating', 'created').iterator():
+        exponent = (created - epoch).total_seconds() / settings.TRENDING_HALF_LIFE
+        scores[movie_id] = log_add(scores.get(movie_id), exponent)
+        rating_sums[movie_id] = log_add(rating_sums.get(movie_id), exponent + math.log2(rating))
+    Movie.objects.update(trending_score=0)
+    MovieStats.objects.update(recent_rating_sum=0, recent_weight=0)
+    Movie.objects.bulk_update([Movie(id=movie_id, trending_score=score) for movie_id, score in scores.items()],
+                              ['trending_score'], batch_size=500)
+    MovieStats.objects.bulk_update([
+        MovieStats(movie_id=movie_id, recent_rating_sum=rating_sums[movie_id], recent_weight=score)
+        for movie_id, score in scores.items()
+    ], ['recent_rating_sum', 'recent_weight'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movielist_app', '0008_moviestats'),
+    ]
+
+    operations = [
+        migrations.RunPython(score_reviews, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movie_trending_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movie_platform_trending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('num_ratings__gt', 0)), fields=['-trending_score', '-id'], name='movie_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('num_ratings__gt', 0)), fields=['platform', '-trending_score', '-id'], name='movie_platform_trending_idx'),
+        ),
+    ]
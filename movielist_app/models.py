@@ -1,15 +1,41 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from movielist_app import ratings, search, snapshots
+from movielist_app.api.cache import invalidate_on_commit
+
+class StreamPlatformQuerySet(models.QuerySet):
+
+    def with_watchlist(self, expand=()):
+        # movie ids only by default, full movies (and their reviews) when expanded
+        if 'reviews' in expand:
+            movies = Movie.objects.with_related()
+        elif 'watchlist' in expand:
+            movies = Movie.objects.select_related('platform')
+        else:
+            movies = Movie.objects.only('id', 'platform')
+        return self.prefetch_related(models.Prefetch('watchlist', queryset=movies.order_by('id')))
 
 class StreamPlatform(models.Model):
     platform = models.CharField(max_length=30, unique=True)
     about = models.CharField(max_length=50)
     website = models.URLField(max_length=100)
     
+    objects = StreamPlatformQuerySet.as_manager()
+    
     def __str__(self):
         return self.platform
 
+class MovieQuerySet(models.QuerySet):
+
+    def with_related(self):
+        # platform name and every nested review (with its user) in a fixed number of queries
+        return self.select_related('platform').prefetch_related(
+            models.Prefetch('reviews', queryset=Review.objects.select_related('review_user'))
+        )
+
 class Movie(models.Model):
     title = models.CharField(max_length=50)
     storyline = models.CharField(max_length=200)
@@ -17,13 +43,79 @@ class Movie(models.Model):
     active = models.BooleanField(default=True)
     avg_rating = models.FloatField(default=0)
     num_ratings = models.IntegerField(default=0)
+    rating_sum = models.PositiveBigIntegerField(default=0)
+    # see movielist_app.ratings
+    trending_score = models.FloatField(default=0)
     created = models.DateTimeField(auto_now_add=True)
+    
+    objects = MovieQuerySet.as_manager()
+    
     class Meta:
         unique_together = ['title', 'storyline', 'platform']
+        # the top and trending rankings, read in index order a page at a time
+        indexes = [
+            models.Index(fields=['-avg_rating', '-id'], condition=models.Q(num_ratings__gt=0),
+                         name='movie_top_idx'),
+            models.Index(fields=['platform', '-avg_rating', '-id'], condition=models.Q(num_ratings__gt=0),
+                         name='movie_platform_top_idx'),
+            models.Index(fields=['-trending_score', '-id'], condition=models.Q(num_ratings__gt=0),
+                         name='movie_trending_idx'),
+            models.Index(fields=['platform', '-trending_score', '-id'], condition=models.Q(num_ratings__gt=0),
+                         name='movie_platform_trending_idx'),
+        ]
     
     def __str__(self):
         return self.title
 
+class MovieSnapshot(models.Model):
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name="snapshot")
+    data = models.JSONField()
+    
+    def __str__(self):
+        return "Snapshot | " + str(self.movie_id)
+
+class MovieStats(models.Model):
+    """
+    A movie's review counters, kept up to date by movielist_app.ratings with its rating aggregates
+    The recent sums weigh each review like the trending score, so older reviews count for less,
+        and are stored as their log2 like it
+    """
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    active_reviews = models.PositiveIntegerField(default=0)
+    inactive_reviews = models.PositiveIntegerField(default=0)
+    recent_rating_sum = models.FloatField(default=0)
+    recent_weight = models.FloatField(default=0)
+    
+    @property
+    def histogram(self):
+        return {str(rating): getattr(self, 'rating_%d' % rating) for rating in range(1, 6)}
+    
+    @property
+    def num_ratings(self):
+        return self.active_reviews + self.inactive_reviews
+    
+    @property
+    def avg_rating(self):
+        total = sum(rating * count for rating, count in enumerate(self.histogram.values(), 1))
+        return total / self.num_ratings if self.num_ratings else 0.0
+    
+    @property
+    def recent_avg_rating(self):
+        # the sums of a movie without reviews are only rounding residue
+        return 2.0 ** (self.recent_rating_sum - self.recent_weight) if self.num_ratings else 0.0
+    
+    @property
+    def recent_num_ratings(self):
+        return ratings.decayed(self.recent_weight) if self.num_ratings else 0.0
+    
+    def __str__(self):
+        return "Stats | " + str(self.movie_id)
+
 class Review(models.Model):
     review_user = models.ForeignKey(User, on_delete=models.CASCADE)
     rating = models.PositiveBigIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
@@ -33,5 +125,102 @@ class Review(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     update = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['movie', 'created', 'id'], name='review_movie_created_idx'),
+            models.Index(fields=['movie', 'created', 'id'], condition=models.Q(active=True),
+                         name='review_active_movie_idx'),
+            models.Index(fields=['review_user', 'id'], name='review_user_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'review_user'], name='unique_review_per_user'),
+        ]
+    
+    # the rating a review was loaded with is what a save changes, so it's never read back before the save.
+    # Writers that can race lock the row as they load it, as ReviewById does
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        review = super().from_db(db, field_names, values)
+        if 'rating' in review.__dict__ and 'active' in review.__dict__:
+            review._previous_rating = (review.rating, review.active)
+        return review
+    
     def __str__(self):
-        return "Score: " + str(self.rating) + " | " + self.watchlist.title + " | " + str(self.review_user)
\ No newline at end of file
+        return "Score: " + str(self.rating) + " | " + self.watchlist.title + " | " + str(self.review_user)
+
+
+@receiver(post_save, sender=Movie)
+def create_movie_stats(sender, instance=None, created=False, **kwargs):
+    if created:
+        MovieStats.objects.create(movie=instance)
+
+# a review saved without its rating loaded, like one loaded with only() or built with an existing pk,
+# has it read back instead, so the save isn't counted as another review
+@receiver(pre_save, sender=Review)
+def read_previous_rating(sender, instance=None, **kwargs):
+    if instance.pk is None or hasattr(instance, '_previous_rating'):
+        return
+    previous_rating = Review.objects.filter(pk=instance.pk).values_list('rating', 'active').first()
+    if previous_rating is not None:
+        # deferred fields aren't saved, so they keep the values read here
+        for field, value in zip(('rating', 'active'), previous_rating):
+            instance.__dict__.setdefault(field, value)
+    instance._previous_rating = previous_rating
+
+@receiver(post_save, sender=Review)
+def add_or_change_rating(sender, instance=None, created=False, **kwargs):
+    previous_rating = getattr(instance, '_previous_rating', None)
+    if created or previous_rating is None:
+        ratings.add_rating(instance)
+    else:
+        ratings.change_rating(instance, *previous_rating)
+    instance._previous_rating = (instance.rating, instance.active)
+
+def deleted_with_movie(origin):
+    # reviews deleted by a movie's (or platform's) cascade don't need their movie's aggregates updated
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return model in (Movie, StreamPlatform)
+
+@receiver(post_delete, sender=Review)
+def remove_rating(sender, instance=None, origin=None, **kwargs):
+    if not deleted_with_movie(origin):
+        ratings.remove_rating(instance)
+
+@receiver([post_save, post_delete], sender=StreamPlatform)
+def invalidate_platform_responses(sender, instance=None, **kwargs):
+    invalidate_on_commit('platforms', 'platform:%s' % instance.pk)
+
+@receiver([post_save, post_delete], sender=Movie)
+def invalidate_movie_responses(sender, instance=None, **kwargs):
+    invalidate_on_commit('movies', 'movie:%s' % instance.pk)
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_review_responses(sender, instance=None, **kwargs):
+    invalidate_on_commit('movies', 'movie:%s' % instance.movie_id)
+
+@receiver(post_save, sender=Movie)
+def index_movie(sender, instance=None, **kwargs):
+    search.index_movie(instance.pk)
+
+@receiver(post_delete, sender=Movie)
+def remove_movie_from_index(sender, instance=None, **kwargs):
+    search.remove_movie(instance.pk)
+
+@receiver(post_save, sender=StreamPlatform)
+def index_platform(sender, instance=None, created=False, **kwargs):
+    if not created:
+        search.index_platform(instance.pk)
+
+@receiver(post_save, sender=Movie)
+def refresh_movie_snapshot(sender, instance=None, **kwargs):
+    snapshots.refresh(instance.pk)
+
+@receiver(post_save, sender=StreamPlatform)
+def refresh_platform_snapshots(sender, instance=None, created=False, **kwargs):
+    if not created:
+        snapshots.refresh_platform(instance.pk)
+
+@receiver([post_save, post_delete], sender=Review)
+def refresh_review_snapshot(sender, instance=None, origin=None, **kwargs):
+    if not deleted_with_movie(origin):
+        snapshots.refresh(instance.movie_id)
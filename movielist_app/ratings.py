@@ -0,0 +1,171 @@
+import datetime
+import math
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Abs, Cast, Greatest, Log, Power
+from django.utils import timezone
+from movielist_app import models
+
+
+# Each review weighs 2 ** (half-lives between the epoch and the review) towards its movie's trending score.
+# Decaying every weight to the present would divide them all by the same number,
+# so the summed weights already rank movies by their decayed review counts and never need recomputing.
+# The sums are stored as their log2, which only grows by one a half-life, so they can't overflow
+TRENDING_EPOCH = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+
+# the least a removal leaves of a log-space sum, as a fraction of it. Anything smaller is rounding error
+RESIDUE = 2.0 ** -52
+
+
+def trending_exponent(created):
+    # the log2 of a review's weight
+    return (created - TRENDING_EPOCH).total_seconds() / settings.TRENDING_HALF_LIFE
+
+
+def log_sum(*exponents):
+    """
+    The log2 of the sum of 2 ** each exponent, without computing the powers themselves
+    None when there's nothing to sum
+    """
+    exponents = [exponent for exponent in exponents if exponent is not None]
+    if not exponents:
+        return None
+    top = max(exponents)
+    return top + math.log2(math.fsum(2.0 ** (exponent - top) for exponent in exponents))
+
+
+def decayed(score, now=None):
+    """
+    A stored trending score as the number of reviews it's worth now,
+        with a review counting half as much every TRENDING_HALF_LIFE seconds
+    """
+    return 2.0 ** (score - trending_exponent(now or timezone.now()))
+
+
+class LogDelta:
+    """
+    A change to a sum that's stored as its log2, as the log2 of the amount added or taken out
+    Deltas add up like the amounts they stand for
+    """
+
+    def __init__(self, added=None, removed=None):
+        # adding and taking out at once only changes the sum by the difference
+        if added is not None and removed is not None:
+            if added > removed:
+                added, removed = added + math.log2(1 - 2.0 ** (removed - added)), None
+            elif removed > added:
+                added, removed = None, removed + math.log2(1 - 2.0 ** (added - removed))
+            else:
+                added = removed = None
+        self.added = added
+        self.removed = removed
+
+    @classmethod
+    def of(cls, exponent, sign=1):
+        return cls(added=exponent) if sign > 0 else cls(removed=exponent)
+
+    def __bool__(self):
+        return self.added is not None or self.removed is not None
+
+    def __add__(self, other):
+        return LogDelta(log_sum(self.added, other.added), log_sum(self.removed, other.removed))
+
+    def resolve(self, field, empty):
+        """
+        An update expression applying the delta to the field,
+            where `empty` matches the rows whose sum has nothing in it, and so no meaningful log
+        """
+        total = F(field)
+        if self.added is not None:
+            added = Value(self.added)
+            # log2(2 ** total + 2 ** added), with the larger power factored out
+            return Case(
+                When(empty, then=added),
+                default=Greatest(total, added) + Log(2, 1 + Power(2, -Abs(total - added))),
+                output_field=FloatField(),
+            )
+        if self.removed is not None:
+            # log2(2 ** total - 2 ** removed), where rounding can leave nothing or less behind
+            return total + Log(2, Greatest(1 - Power(2, Value(self.removed) - total), Value(RESIDUE)))
+        return total
+
+
+def get_stats_changes(rating, active, created, sign=1):
+    # a review's share of its movie's MovieStats counters, negated to take it back out
+    exponent = trending_exponent(created)
+    return {
+        'rating_%d' % rating: sign,
+        'active_reviews' if active else 'inactive_reviews': sign,
+        'recent_rating_sum': LogDelta.of(exponent + math.log2(rating), sign),
+        'recent_weight': LogDelta.of(exponent, sign),
+    }
+
+
+def merge_changes(*changes):
+    merged = {}
+    for change in changes:
+        for field, delta in change.items():
+            merged[field] = merged[field] + delta if field in merged else delta
+    return merged
+
+
+def get_stats(reviews):
+    # the MovieStats counters of a movie with only these reviews, as the review signals would have left them
+    changes = merge_changes(*[get_stats_changes(review.rating, review.active, review.created) for review in reviews])
+    return {field: delta.added if isinstance(delta, LogDelta) else delta for field, delta in changes.items()}
+
+
+def get_trending_score(reviews):
+    return log_sum(*[trending_exponent(review.created) for review in reviews]) if reviews else 0.0
+
+
+# aggregates are changed in the database with F() so concurrent review writes can't overwrite each other.
+# The log-space sums start from the first review added, so they check whether the row had any reviews,
+# which an UPDATE reads from before it
+def update_rating(movie_id, rating_delta, count_delta, trending=None, stats_changes=None):
+    movie = models.Movie.objects.filter(pk=movie_id)
+    with transaction.atomic():
+        if rating_delta or count_delta or trending:
+            movie.update(
+                rating_sum=F('rating_sum') + rating_delta,
+                num_ratings=F('num_ratings') + count_delta,
+                trending_score=trending.resolve('trending_score', Q(num_ratings__lte=0)) if trending
+                else F('trending_score'),
+            )
+            movie.update(
+                avg_rating=Case(
+                    When(num_ratings__lte=0, then=Value(0.0)),
+                    default=Cast('rating_sum', FloatField()) / F('num_ratings'),
+                    output_field=FloatField(),
+                ),
+                trending_score=Case(
+                    When(num_ratings__lte=0, then=Value(0.0)),
+                    default=F('trending_score'),
+                    output_field=FloatField(),
+                ),
+            )
+        if stats_changes:
+            empty = Q(active_reviews__lte=0, inactive_reviews__lte=0)
+            models.MovieStats.objects.filter(movie_id=movie_id).update(**{
+                field: delta.resolve(field, empty) if isinstance(delta, LogDelta) else F(field) + delta
+                for field, delta in stats_changes.items() if delta
+            })
+
+
+def add_rating(review):
+    update_rating(review.movie_id, review.rating, 1, LogDelta.of(trending_exponent(review.created)),
+                  get_stats_changes(review.rating, review.active, review.created))
+
+
+def change_rating(review, old_rating, old_active):
+    if (old_rating, old_active) != (review.rating, review.active):
+        update_rating(review.movie_id, review.rating - old_rating, 0, stats_changes=merge_changes(
+            get_stats_changes(old_rating, old_active, review.created, -1),
+            get_stats_changes(review.rating, review.active, review.created),
+        ))
+
+
+def remove_rating(review):
+    update_rating(review.movie_id, -review.rating, -1, LogDelta.of(trending_exponent(review.created), -1),
+                  get_stats_changes(review.rating, review.active, review.created, -1))
@@ -0,0 +1,82 @@
+import re
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from movielist_app import models
+
+
+# SQLite FTS5 inverted index over each movie's title, storyline and platform name, keyed by the movie's id.
+# It is created by migration 0005 and kept up to date by the Movie and StreamPlatform signals
+TABLE = 'movielist_app_movie_search'
+
+INDEX_SQL = (
+    'INSERT INTO {table} (rowid, title, storyline, platform) '
+    'SELECT movie.id, movie.title, movie.storyline, platform.platform '
+    'FROM {movie} movie INNER JOIN {platform} platform ON platform.id = movie.platform_id '
+)
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def _index_sql(where):
+    return INDEX_SQL.format(
+        table=TABLE,
+        movie=models.Movie._meta.db_table,
+        platform=models.StreamPlatform._meta.db_table,
+    ) + where
+
+
+def index_movie(movie_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE rowid = %%s' % TABLE, [movie_id])
+        cursor.execute(_index_sql('WHERE movie.id = %s'), [movie_id])
+
+
+def index_platform(platform_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE rowid IN (SELECT id FROM %s WHERE platform_id = %%s)'
+                       % (TABLE, models.Movie._meta.db_table), [platform_id])
+        cursor.execute(_index_sql('WHERE movie.platform_id = %s'), [platform_id])
+
+
+def remove_movie(movie_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE rowid = %%s' % TABLE, [movie_id])
+
+
+def rebuild():
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s' % TABLE)
+        cursor.execute(_index_sql(''))
+
+
+def build_query(terms):
+    # every word must match, each as a prefix, so "aven end" finds "Avengers Endgame"
+    words = re.findall(r'\w+', terms.lower())
+    return ' '.join('"%s"*' % word for word in words)
+
+
+def search(queryset, terms):
+    """
+    Narrow a movie queryset to the movies matching the search terms,
+        annotated with their bm25 rank (lower is a better match)
+    """
+    query = build_query(terms)
+    if not query:
+        return queryset
+    # the index is joined once, so the MATCH runs once and each matching row brings its rank along
+    return queryset.extra(
+        tables=[TABLE],
+        where=['%s MATCH %%s' % TABLE, '%s.rowid = %s.id' % (TABLE, models.Movie._meta.db_table)],
+        params=[query],
+    ).annotate(search_rank=RawSQL('%s.rank' % TABLE, [], output_field=FloatField()))
@@ -0,0 +1,15 @@
+from movielist_app import models
+
+
+# Pre-serialized compact movie rows for the compact movie list, rebuilt whenever a movie,
+# its platform or its rating aggregates change so that reads never join or serialize
+def refresh(*movie_ids):
+    from movielist_app.api.serializers import MovieSnapshotSerializer
+    movies = models.Movie.objects.select_related('platform').filter(pk__in=movie_ids)
+    snapshots = [models.MovieSnapshot(movie=movie, data=MovieSnapshotSerializer(movie).data) for movie in movies]
+    models.MovieSnapshot.objects.bulk_create(snapshots, update_conflicts=True,
+                                             unique_fields=['movie_id'], update_fields=['data'])
+
+
+def refresh_platform(platform_id):
+    refresh(*models.Movie.objects.filter(platform=platform_id).values_list('id', flat=True))
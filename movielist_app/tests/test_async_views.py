@@ -0,0 +1,82 @@
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework.authtoken.models import Token
+from movielist_app import models
+from movielist_app.api import async_views, views
+
+
+# responses aren't cached, so both views really render every request
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class AsyncViewsTestCase(APITestCase):
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.admin_user = User.objects.create_superuser(username="admin", password="admin_password")
+        self.admin_token = Token.objects.get(user__username=self.admin_user)
+        self.user = User.objects.create_user(username="example", password="password@123")
+
+        self.stream = models.StreamPlatform.objects.create(platform="Netflix", about="#1 Platform", website="https://www.netflix.com")
+        self.movies = [models.Movie.objects.create(title="Movie %d" % i, storyline="Storyline %d" % i, platform=self.stream)
+                       for i in range(3)]
+        models.Review.objects.create(review_user=self.user, rating=4, description="Good", movie=self.movies[0])
+        models.Review.objects.create(review_user=self.admin_user, rating=2, description="Bad", movie=self.movies[0])
+
+
+    def call(self, view_class, request, **kwargs):
+        view = view_class.as_view()
+        response = async_to_sync(view)(request, **kwargs) if view_class.view_is_async else view(request, **kwargs)
+        return response.render()
+
+
+    def assertSameResponse(self, name, url, **kwargs):
+        sync_response = self.call(getattr(views, name), self.factory.get(url), **kwargs)
+        async_response = self.call(getattr(async_views, name), self.factory.get(url), **kwargs)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.content, sync_response.content)
+        return async_response
+
+
+    def test_async_views_match_sync_views(self):
+        """
+        Ensure the async read views render exactly what their sync counterparts do
+        """
+        for name in ['MovieList', 'MovieById', 'ReviewList', 'StreamPlatformById']:
+            self.assertTrue(getattr(async_views, name).view_is_async)
+
+        response = self.assertSameResponse('MovieList', '/imdb/list/?size=2')
+        self.assertEqual(response.data['count'], 3)
+        self.assertSameResponse('MovieList', '/imdb/list/?search=movie%201')
+        response = self.assertSameResponse('MovieList', '/imdb/list/?search=!!!')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertSameResponse('MovieById', '/imdb/1/', pk=self.movies[0].pk)
+        self.assertSameResponse('MovieById', '/imdb/999/', pk=999)
+        self.assertSameResponse('ReviewList', '/imdb/1/review/?active=true', pk=self.movies[0].pk)
+        self.assertSameResponse('StreamPlatformById', '/imdb/stream/1/', pk=self.stream.pk)
+        self.assertSameResponse('StreamPlatformById', '/imdb/stream/999/', pk=999)
+
+
+    def test_async_view_authentication(self):
+        """
+        Ensure async views authenticate tokens and enforce permissions before writing
+        """
+        data = {"title": "Renamed", "storyline": "Storyline 0"}
+        request = self.factory.put('/imdb/1/', data, format='json')
+        response = self.call(async_views.MovieById, request, pk=self.movies[0].pk)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        request = self.factory.put('/imdb/1/', data, format='json', HTTP_AUTHORIZATION='Token invalid')
+        response = self.call(async_views.MovieById, request, pk=self.movies[0].pk)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        request = self.factory.put('/imdb/1/', data, format='json', HTTP_AUTHORIZATION='Token ' + self.admin_token.key)
+        response = self.call(async_views.MovieById, request, pk=self.movies[0].pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(models.Movie.objects.get(pk=self.movies[0].pk).title, "Renamed")
+
+        request = self.factory.delete('/imdb/stream/1/', HTTP_AUTHORIZATION='Token ' + self.admin_token.key)
+        response = self.call(async_views.StreamPlatformById, request, pk=self.stream.pk)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(models.StreamPlatform.objects.exists())
@@ -0,0 +1,73 @@
+import datetime
+import io
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count, Max, Min, Q, Sum
+from rest_framework.test import APITransactionTestCase
+from movielist_app import models
+
+
+class SeedCatalogTestCase(APITransactionTestCase):
+
+    def seed(self, *args, **options):
+        options = dict(platforms=3, users=200, movies=60, reviews=400, chunk_size=25, **options)
+        call_command('seed_catalog', *args, stdout=io.StringIO(), **options)
+
+
+    def test_seed_catalog(self):
+        """
+        Ensure the seeded aggregates match the generated reviews and popularity is skewed
+        """
+        self.seed()
+        movies = models.Movie.objects.annotate(
+            review_count=Count('reviews'), review_sum=Sum('reviews__rating'),
+            active_count=Count('reviews', filter=Q(reviews__active=True)),
+        ).select_related('stats')
+        counts = []
+        for movie in movies:
+            self.assertEqual(movie.num_ratings, movie.review_count)
+            self.assertEqual(movie.rating_sum, movie.review_sum or 0)
+            self.assertAlmostEqual(movie.avg_rating, movie.review_sum / movie.review_count if movie.review_count else 0)
+            self.assertEqual(movie.stats.num_ratings, movie.review_count)
+            self.assertEqual(movie.stats.active_reviews, movie.active_count)
+            counts.append(movie.review_count)
+
+        counts.sort(reverse=True)
+        # the most popular tenth of the catalog has about half the reviews, while the tail gets a few each
+        self.assertGreater(sum(counts[:6]), sum(counts) * 0.4)
+        self.assertLess(counts[30], 5)
+        # the deferred indexes were built again
+        indexes = connection.introspection.get_constraints(connection.cursor(), models.Review._meta.db_table)
+        self.assertTrue({index.name for index in models.Review._meta.indexes} <= set(indexes))
+
+
+    def test_seed_catalog_deterministic(self):
+        """
+        Ensure the same seed generates the same catalog, review dates included, and a filled catalog is refused
+        """
+        self.seed(seed=7)
+        first = list(models.Review.objects.order_by('id').values_list('movie__title', 'review_user__username', 'rating', 'created'))
+        with self.assertRaises(CommandError):
+            self.seed(seed=7)
+
+        models.Movie.objects.all().delete()
+        models.StreamPlatform.objects.all().delete()
+        User.objects.all().delete()
+        self.seed(seed=7)
+        second = list(models.Review.objects.order_by('id').values_list('movie__title', 'review_user__username', 'rating', 'created'))
+        self.assertEqual(first, second)
+
+
+    def test_seed_catalog_now(self):
+        """
+        Ensure the review dates count back from --now, read as UTC when it has no offset
+        """
+        self.seed('--now', '2030-06-01T12:00:00', days=10)
+        now = datetime.datetime(2030, 6, 1, 12, tzinfo=datetime.timezone.utc)
+        dates = models.Review.objects.aggregate(first=Min('created'), last=Max('created'))
+        self.assertGreater(dates['first'], now - datetime.timedelta(days=10))
+        self.assertLessEqual(dates['last'], now)
+        with self.assertRaises(CommandError):
+            call_command('seed_catalog', '--now', 'yesterday', stdout=io.StringIO(), stderr=io.StringIO())
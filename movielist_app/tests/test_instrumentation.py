@@ -0,0 +1,102 @@
+import json
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework.authtoken.models import Token
+from imdb import instrumentation
+from movielist_app import models
+from movielist_app.api.cache import get_cache
+
+
+class InstrumentationTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        get_cache().clear()
+        instrumentation.reset_metrics()
+        self.auth_user = User.objects.create_user(username="auth", password="auth_password")
+        self.auth_token = Token.objects.get(user__username=self.auth_user)
+
+        self.admin_user = User.objects.create_superuser(username="admin",  password="admin_password")
+        self.admin_token = Token.objects.get(user__username=self.admin_user)
+
+        self.stream = models.StreamPlatform.objects.create(platform="Netflix", about="#1 Platform", website="https://www.netflix.com")
+        self.movie = models.Movie.objects.create(title="Step Brothers 2", storyline="More Dale and Brennan", platform=self.stream)
+
+    def tearDown(self):
+        instrumentation.reset_metrics()
+
+
+    def get_timings(self, response):
+        timings = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            timings[name] = dict(param.split('=', 1) for param in params)
+        return timings
+
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1)
+    def test_server_timing(self):
+        """
+        Ensure a sampled request reports its queries, authentication, throttling, serialization and rendering
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.auth_token.key)
+        with self.assertNumQueries(3) as queries:
+            response = self.client.get(reverse('movie-detail', args=(self.movie.id,)))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        timings = self.get_timings(response)
+        self.assertEqual(list(timings), ['total', 'db', 'auth', 'throttle', 'serialize', 'render'])
+        self.assertEqual(timings['db']['desc'], '"%d queries"' % len(queries))
+        self.assertGreater(float(timings['total']['dur']), float(timings['db']['dur']))
+
+        # the cached response skips the serializer and the token is cached too
+        response = self.client.get(reverse('movie-detail', args=(self.movie.id,)))
+        timings = self.get_timings(response)
+        self.assertEqual(timings['db']['desc'], '"0 queries"')
+        self.assertNotIn('serialize', timings)
+
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1, INSTRUMENTATION_LOG=True)
+    def test_log(self):
+        """
+        Ensure sampled requests are logged as one JSON object each
+        """
+        with self.assertLogs('imdb.instrumentation', 'INFO') as logs:
+            self.client.get(reverse('movie-detail', args=(self.movie.id,)))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['route'], 'GET /imdb/<int:pk>/')
+        self.assertEqual(record['status'], status.HTTP_200_OK)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['serialize_ms'], 0)
+
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_metrics(self):
+        """
+        Ensure every request is counted per route, unsampled ones without a Server-Timing header,
+            and only admins can see the metrics
+        """
+        for i in range(3):
+            response = self.client.get(reverse('movie-detail', args=(self.movie.id,)))
+            self.assertNotIn('Server-Timing', response)
+        with override_settings(INSTRUMENTATION_SAMPLE_RATE=1):
+            self.client.get(reverse('movie-detail', args=(self.movie.id + 1,)))
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.auth_token.key)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.admin_token.key)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metrics = response.data['GET /imdb/<int:pk>/']
+        self.assertEqual(metrics['requests'], 4)
+        self.assertEqual(metrics['sampled'], 1)
+        self.assertEqual(metrics['duration']['count'], 4)
+        self.assertEqual(sum(metrics['duration']['buckets'].values()), 4)
+        self.assertEqual(metrics['phases']['db']['count'], 1)
+        self.assertIn('GET /imdb/metrics/', response.data)
@@ -0,0 +1,267 @@
+import unittest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework.authtoken.models import Token
+from imdb import nplusone
+from movielist_app import models, search
+from movielist_app.api import pagination, serializers
+from movielist_app.api.cache import get_cache
+
+
+class QueryCountTestCase(APITestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.admin_user = User.objects.create_superuser(username="admin",  password="admin_password")
+        self.admin_token = Token.objects.get(user__username=self.admin_user)
+
+        self.users = [User.objects.create_user(username="user%d" % i, password="password@123") for i in range(3)]
+        self.stream = models.StreamPlatform.objects.create(platform="Netflix", about="#1 Platform", website="https://www.netflix.com")
+
+        self.movies = []
+        for i in range(5):
+            movie = models.Movie.objects.create(title="Movie %d" % i, storyline="Storyline %d" % i, platform=self.stream)
+            for user in self.users:
+                models.Review.objects.create(review_user=user, rating=4, description="Good", movie=movie)
+            self.movies.append(movie)
+
+
+    def assertQueryCount(self, num, url):
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+
+    def test_movie_endpoints(self):
+        """
+        Ensure movie endpoints run a fixed number of queries regardless of how many movies and reviews are rendered
+        """
+        # count, movies joined with platforms, reviews joined with users
+        response = self.assertQueryCount(3, reverse('movie-list'))
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(len(response.data['results'][0]['reviews']), 3)
+
+        self.assertQueryCount(2, reverse('movie-detail', args=[self.movies[0].pk]))
+
+        # movies joined with platforms, reviews joined with users
+        ids = ','.join(str(movie.pk) for movie in self.movies)
+        response = self.assertQueryCount(2, reverse('movie-batch') + '?ids=' + ids)
+        self.assertEqual(len(response.data['results']), 5)
+
+        self.assertQueryCount(1, reverse('movie-stats', args=[self.movies[0].pk]))
+        response = self.assertQueryCount(1, reverse('movie-stats-batch') + '?ids=' + ids)
+        self.assertEqual([stats['num_ratings'] for stats in response.data['results']], [3] * 5)
+
+
+    def test_compact_movie_list(self):
+        """
+        Ensure the compact movie list is served from pre-serialized rows that follow every write
+        """
+        # count, snapshots
+        response = self.assertQueryCount(2, reverse('movie-list-compact'))
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(response.data['results'][0]['platform'], "Netflix")
+        self.assertEqual(response.data['results'][0]['num_ratings'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Review.objects.filter(movie=self.movies[0]).first().delete()
+            self.stream.platform = "Hulu"
+            self.stream.save()
+        response = self.client.get(reverse('movie-list-compact'))
+        self.assertEqual(response.data['results'][0]['platform'], "Hulu")
+        self.assertEqual(response.data['results'][0]['num_ratings'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movies[1].delete()
+        response = self.client.get(reverse('movie-list-compact'))
+        self.assertEqual(len(response.data['results']), 4)
+
+
+    def test_review_endpoints(self):
+        """
+        Ensure review endpoints don't look up each review's user separately
+        """
+        self.assertQueryCount(2, reverse('reviews-for-movie', args=[self.movies[0].pk]))
+        self.assertQueryCount(1, reverse('review-detail', args=[self.movies[0].reviews.first().pk]))
+
+        # token lookup, count, reviews joined with users
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.admin_token.key)
+        self.assertQueryCount(3, reverse('reviews-by-user', args=[self.users[0].username]))
+
+
+    def test_stream_platform_endpoints(self):
+        """
+        Ensure streaming platform endpoints run a fixed number of queries
+        """
+        # platforms, movie ids
+        self.assertQueryCount(2, reverse('stream-list'))
+        # platforms, movies joined with platforms, reviews joined with users
+        self.assertQueryCount(3, reverse('stream-list') + '?expand=watchlist,reviews')
+        self.assertQueryCount(1, reverse('stream-detail', args=[self.stream.pk]))
+
+
+    def test_cached_responses(self):
+        """
+        Ensure repeated reads are served from the response cache until a write invalidates them
+        """
+        url = reverse('movie-detail', args=[self.movies[0].pk])
+        self.assertQueryCount(2, url)
+        self.assertQueryCount(0, url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Review.objects.create(review_user=self.admin_user, rating=1, description="Bad", movie=self.movies[0])
+            # the entry stays valid until the write commits, so no read can cache the old rows as current
+            self.assertQueryCount(0, url)
+        response = self.assertQueryCount(2, url)
+        self.assertEqual(len(response.data['reviews']), 4)
+        self.assertEqual(response.data['num_ratings'], 4)
+
+        # writes to other movies leave this movie's entry alone
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movies[1].title = "Renamed"
+            self.movies[1].save()
+        self.assertQueryCount(0, url)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.admin_token.key)
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(response.data['hits'], 0)
+
+
+    def test_conditional_requests(self):
+        """
+        Ensure clients holding a current ETag or Last-Modified date get a 304 without any queries
+        """
+        url = reverse('reviews-for-movie', args=[self.movies[0].pk])
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Review.objects.create(review_user=self.admin_user, rating=1, description="Bad", movie=self.movies[0])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+    def test_repeated_queries(self):
+        """
+        Ensure N+1 queries are flagged with the serializer fields that ran them
+        """
+        with self.assertRaises(nplusone.RepeatedQueries) as context:
+            with nplusone.assert_no_repeated_queries(threshold=4):
+                serializers.MovieSerializer(models.Movie.objects.all(), many=True).data
+        report = str(context.exception)
+        self.assertIn('2 queries repeated more than 4 times', report)
+        self.assertIn('15x from serializer field MovieSerializer.reviews.review_user', report)
+        self.assertIn('5x from serializer field MovieSerializer.reviews', report)
+        self.assertIn('movielist_app/tests/test_queries.py', report)
+
+        # the API prefetches what its serializers nest
+        ids = ','.join(str(movie.pk) for movie in self.movies)
+        for url in [reverse('movie-list'), reverse('movie-batch') + '?ids=' + ids,
+                    reverse('stream-list') + '?expand=watchlist,reviews',
+                    reverse('reviews-for-movie', args=[self.movies[0].pk])]:
+            with nplusone.assert_no_repeated_queries(threshold=1):
+                self.client.get(url)
+
+
+    @override_settings(REPEATED_QUERY_WARNINGS=True, REPEATED_QUERY_THRESHOLD=0)
+    def test_repeated_queries_middleware(self):
+        """
+        Ensure the development middleware logs requests that repeat queries,
+            without hiding them from a detector around the request
+        """
+        url = reverse('movie-detail', args=[self.movies[0].pk])
+        with self.assertLogs('imdb.nplusone', 'WARNING') as logs, nplusone.QueryPatternDetector(0) as detector:
+            self.client.get(url)
+        self.assertIn('GET %s: 2 queries repeated more than 0 times' % url, logs.output[0])
+        self.assertEqual(len(detector.repeated), 2)
+
+
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "query plans are checked against SQLite's EXPLAIN QUERY PLAN")
+class QueryPlanTestCase(TestCase):
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn('USING INDEX %s' % index, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+    def test_review_query_plans(self):
+        """
+        Ensure the hot review queries are answered from an index without sorting
+        """
+        self.assertUsesIndex(models.Review.objects.filter(movie=1).order_by('created', 'id'), 'review_movie_created_idx')
+        self.assertUsesIndex(models.Review.objects.filter(movie=1, active=True).order_by('created', 'id'), 'review_active_movie_idx')
+        self.assertUsesIndex(models.Review.objects.filter(movie=1, review_user=1), 'sqlite_autoindex_movielist_app_review')
+        self.assertUsesIndex(models.Review.objects.filter(review_user__username="auth").order_by('id'), 'movielist_app_review_review_user_id')
+
+
+    def test_movie_query_plans(self):
+        """
+        Ensure the movie list is read in primary key order without sorting
+        """
+        plan = models.Movie.objects.order_by('id').explain()
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+    def test_ranking_query_plans(self):
+        """
+        Ensure the top and trending lists are read in ranking order from their indexes, with or without a platform
+        """
+        top = models.Movie.objects.filter(num_ratings__gt=0).order_by('-avg_rating', '-id')
+        self.assertUsesIndex(top, 'movie_top_idx')
+        self.assertUsesIndex(top.filter(platform=1), 'movie_platform_top_idx')
+        trending = models.Movie.objects.filter(num_ratings__gt=0).order_by('-trending_score', '-id')
+        self.assertUsesIndex(trending, 'movie_trending_idx')
+        self.assertUsesIndex(trending.filter(platform=1), 'movie_platform_trending_idx')
+
+
+    def test_keyset_query_plans(self):
+        """
+        Ensure the page after a cursor is found with a range on the ordering index, not a scan up to the cursor
+        """
+        seek = pagination.MovieTopPagination().get_position_filter('["4.5","10"]', False)
+        plan = models.Movie.objects.filter(seek, num_ratings__gt=0).order_by('-avg_rating', '-id').explain()
+        self.assertIn('USING INDEX movie_top_idx (avg_rating<?)', plan)
+        seek = pagination.ReviewListPagination().get_position_filter('["2026-01-01 00:00:00+00:00","10"]', True)
+        plan = models.Review.objects.filter(seek, movie=1).order_by('-created', '-id').explain()
+        self.assertIn('USING INDEX review_movie_created_idx (movie_id=? AND created<?)', plan)
+
+
+    def test_search_query_plan(self):
+        """
+        Ensure a search runs its MATCH once, joining each match's movie by primary key
+        """
+        plan = search.search(models.Movie.objects.all(), "step bro").order_by('search_rank', 'id').explain()
+        self.assertEqual(plan.count('VIRTUAL TABLE INDEX'), 1, plan)
+        self.assertNotIn('CORRELATED', plan)
+        self.assertIn('SEARCH movielist_app_movie USING INTEGER PRIMARY KEY', plan)
+
+
+    def test_sqlite_pragmas(self):
+        """
+        Ensure new SQLite connections are tuned with SQLITE_PRAGMAS
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA synchronous')
+            # NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
@@ -0,0 +1,94 @@
+import datetime
+import decimal
+import io
+from collections import OrderedDict
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from movielist_app import models
+from movielist_app.api import serializers
+from movielist_app.api.parsers import FastJSONParser
+from movielist_app.api.renderers import FastJSONRenderer
+
+
+class ValuesSerializerParityTestCase(TestCase):
+
+    def setUp(self):
+        self.auth_user = User.objects.create_user(username="auth", password="auth_password")
+        self.admin_user = User.objects.create_superuser(username="admin",  password="admin_password")
+
+        self.stream = models.StreamPlatform.objects.create(platform="Netflix",
+                                about="#1 Platform", website="https://www.netflix.com")
+        self.movie = models.Movie.objects.create(platform=self.stream, title="Chip Skylark",
+                                storyline="The life of Chip Skylark", active=True)
+        self.movie2 = models.Movie.objects.create(platform=self.stream, title="Avengers Endgame",
+                                storyline="The Avengers assemble to take down Thanos", active=False)
+        self.movie3 = models.Movie.objects.create(platform=self.stream, title="Step Brothers 2",
+                                storyline="More Dale and Brennan")
+        models.Review.objects.create(review_user=self.admin_user, rating=5, description="Amazing Movie! (Tony Stark dies at the end)",
+                                movie=self.movie2, active=True)
+        models.Review.objects.create(review_user=self.auth_user, rating=2, description="Love his shiny teeth! ✨",
+                                movie=self.movie, active=False)
+        models.Review.objects.create(review_user=self.admin_user, rating=4, description="Catchy songs",
+                                movie=self.movie)
+
+
+    def assertSameJSON(self, fast, slow):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(fast), renderer.render(slow))
+
+
+    def test_movie_parity(self):
+        """
+        Ensure the values() serializer renders movies, with their nested reviews, byte for byte like MovieSerializer
+        """
+        queryset = models.Movie.objects.order_by('id')
+        fast = serializers.MovieValuesSerializer(serializers.MovieValuesSerializer.values(queryset)).data
+        slow = serializers.MovieSerializer(queryset.with_related(), many=True).data
+        self.assertSameJSON(fast, slow)
+
+
+    def test_review_parity(self):
+        """
+        Ensure the values() serializer renders reviews byte for byte like ReviewSerializer
+        """
+        queryset = models.Review.objects.order_by('created')
+        fast = serializers.ReviewValuesSerializer(serializers.ReviewValuesSerializer.values(queryset)).data
+        slow = serializers.ReviewSerializer(queryset.select_related('review_user'), many=True).data
+        self.assertSameJSON(fast, slow)
+
+
+
+
+class FastJSONRendererTestCase(TestCase):
+
+    def test_renderer_parity(self):
+        """
+        Ensure the fast renderer's output is byte for byte the same as DRF's JSONRenderer
+        """
+        data = OrderedDict([
+            ('id', 1),
+            ('avg_rating', 3.6666666666666665),
+            ('num_ratings', 0.1 + 0.2),
+            ('created', datetime.datetime(2022, 10, 18, 3, 39, 4, 123456, tzinfo=datetime.timezone.utc)),
+            ('day', datetime.date(2022, 10, 18)),
+            ('price', decimal.Decimal('9.99')),
+            ('description', "Love his shiny teeth! \u2728 \u2028 \u2029 \"quoted\""),
+            ('reviews', [{'rating': 5, 'active': True, 'update': None}]),
+            (3, 'integer key'),
+        ])
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(data, 'application/json; indent=4'),
+                         JSONRenderer().render(data, 'application/json; indent=4'))
+
+
+    def test_parser(self):
+        """
+        Ensure the fast parser reads JSON like DRF's JSONParser and reports malformed bodies
+        """
+        body = '{"rating": 5, "description": "Catchy songs ✨", "active": true}'.encode()
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"rating": '))
@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from movielist_app.api import throttling
+
+
+class Clock:
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FourPerMinuteThrottle(throttling.AnonRateThrottle):
+    rate = '4/min'
+
+
+class FixedFourPerMinuteThrottle(FourPerMinuteThrottle):
+    sliding = False
+
+
+class ThrottledView(APIView):
+    authentication_classes = []
+    permission_classes = []
+    throttle_classes = [FourPerMinuteThrottle]
+
+    def get(self, request):
+        return Response()
+
+
+class CounterRateThrottleTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.clock = Clock(6000.0)
+        FourPerMinuteThrottle.timer = self.clock
+
+    def tearDown(self):
+        del FourPerMinuteThrottle.timer
+        cache.clear()
+
+
+    def request(self, throttle_class=FourPerMinuteThrottle):
+        return ThrottledView.as_view(throttle_classes=[throttle_class])(self.factory.get('/'))
+
+
+    def test_fixed_window(self):
+        """
+        Ensure a fixed window allows the rate, rejects the rest with a Retry-After and resets on the next window
+        """
+        for i in range(4):
+            self.assertEqual(self.request(FixedFourPerMinuteThrottle).status_code, status.HTTP_200_OK)
+        self.clock.now += 15
+        response = self.request(FixedFourPerMinuteThrottle)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '45')
+        # the counter is a single integer
+        self.assertEqual(cache.get('throttle_anon_127.0.0.1:100'), 4)
+
+        self.clock.now += 45
+        self.assertEqual(self.request(FixedFourPerMinuteThrottle).status_code, status.HTTP_200_OK)
+
+
+    def test_sliding_window(self):
+        """
+        Ensure a sliding window still counts the overlapping part of the previous window
+        """
+        for i in range(4):
+            self.assertEqual(self.request().status_code, status.HTTP_200_OK)
+
+        # half of the previous window overlaps, so two of its four requests still count
+        self.clock.now += 90
+        self.assertEqual(self.request().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.request().status_code, status.HTTP_200_OK)
+        response = self.request()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '15')
+
+        self.clock.now += 15
+        self.assertEqual(self.request().status_code, status.HTTP_200_OK)
@@ -1,14 +1,23 @@
+import base64
+import json
+from unittest import mock
+from urllib.parse import urlencode
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework.authtoken.models import Token
-from movielist_app import models
+from movielist_app import models, ratings
+from movielist_app.api import serializers, streaming, views
+from movielist_app.api.cache import get_cache
 
 
 class StreamPlatformTestCase(APITestCase):
     
     def setUp(self):
+        get_cache().clear()
         self.unauth_user = User.objects.create_user(username="unauth", password="unauth_password")        
         
         self.auth_user = User.objects.create_user(username="auth", password="auth_password")
@@ -64,6 +73,31 @@ class StreamPlatformTestCase(APITestCase):
     
     
         
+    def test_stream_platform_list_expand(self):
+        """
+        Ensure the streaming platform list is compact by default
+            and only embeds movies and reviews when expanded
+        """
+        movie = models.Movie.objects.create(title="Stranger Things", storyline="Kids vs the upside down", platform=self.stream)
+        models.Review.objects.create(review_user=self.auth_user, rating=4, description="Spooky", movie=movie)
+        
+        response = self.client.get(reverse('stream-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        platform = response.data['results'][0]
+        self.assertEqual(platform['movie_count'], 1)
+        self.assertEqual(platform['movie_ids'], [movie.id])
+        self.assertNotIn('watchlist', platform)
+        
+        response = self.client.get(reverse('stream-list'), {'expand': 'watchlist'})
+        platform = response.data['results'][0]
+        self.assertEqual(platform['watchlist'][0]['title'], "Stranger Things")
+        self.assertNotIn('reviews', platform['watchlist'][0])
+        
+        response = self.client.get(reverse('stream-list'), {'expand': 'watchlist,reviews'})
+        platform = response.data['results'][0]
+        self.assertEqual(platform['watchlist'][0]['reviews'][0]['description'], "Spooky")
+        
+        
     def test_stream_platform_ind(self):
         """
         Ensure everyone can view individual steaming platforms
@@ -92,7 +126,8 @@ class StreamPlatformTestCase(APITestCase):
         
         # Ensure admin users can view, put, and delete       
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.admin_token.key)
-        response = self.client.put(reverse('stream-detail', args=[self.stream.pk]), data)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(reverse('stream-detail', args=[self.stream.pk]), data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         
         response = self.client.get(reverse('stream-detail', args=[self.stream.pk]))
@@ -110,6 +145,7 @@ class StreamPlatformTestCase(APITestCase):
 class ReviewTestCase(APITestCase):
     
     def setUp(self):
+        get_cache().clear()
         self.unauth_user = User.objects.create_user(username="example", password="password@123")        
         
         self.auth_user = User.objects.create_user(username="auth", password="auth_password")
@@ -155,6 +191,42 @@ class ReviewTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         response = self.client.delete(reverse('reviews-for-movie', args=(self.movie2.id,)))
         self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        
+        
+    def test_review_list_pagination(self):
+        """
+        Ensure reviews posted at the same time are paged through in id order, seeking past each page
+            instead of skipping over the tied reviews
+        """
+        for i in range(4):
+            critic = User.objects.create_user(username="critic%d" % i, password="critic_password")
+            models.Review.objects.create(review_user=critic, rating=3, description="Review %d" % i, movie=self.movie)
+        models.Review.objects.filter(movie=self.movie).update(created=self.review2.created)
+        expected = list(models.Review.objects.filter(movie=self.movie).order_by('id').values_list('id', flat=True))
+        
+        response = self.client.get(reverse('reviews-for-movie', args=(self.movie.id,)), {'size': 2})
+        ids = [review['id'] for review in response.data['results']]
+        while response.data['next']:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(response.data['next'])
+            self.assertFalse([query for query in queries if 'OFFSET' in query['sql']])
+            ids += [review['id'] for review in response.data['results']]
+        self.assertEqual(ids, expected)
+        
+        previous = []
+        while response.data['previous']:
+            response = self.client.get(response.data['previous'])
+            previous = [review['id'] for review in response.data['results']] + previous
+        self.assertEqual(previous, expected[:4])
+        
+        response = self.client.get(reverse('reviews-for-movie', args=(self.movie.id,)), {'cursor': 'cD0x'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        # cursors that decode, but hold values the ordering fields can't take
+        for url, position in [(reverse('reviews-for-movie', args=(self.movie.id,)), '["garbage","1"]'),
+                              (reverse('movie-list'), '["abc"]'), (reverse('movie-top'), '["x","1"]')]:
+            cursor = base64.b64encode(urlencode({'p': position}).encode()).decode()
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
 
@@ -230,6 +302,121 @@ class ReviewTestCase(APITestCase):
         
 
 
+    def test_review_rating_aggregates(self):
+        """
+        Ensure creating, editing and deleting reviews keeps the movie's rating a true mean
+        """
+        movie = models.Movie.objects.create(platform=self.stream, title="Shrek", storyline="Ogres are like onions")
+        critic = User.objects.create_user(username="critic", password="critic_password")
+        
+        review_ids = []
+        for user, rating in ((self.auth_user, 2), (self.admin_user, 5), (critic, 5)):
+            self.client.force_authenticate(user=user)
+            response = self.client.post(reverse('review-create', args=(movie.id,)), {"rating": rating, "description": "Ogre-some"})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            review_ids.append(response.data['id'])
+        
+        movie.refresh_from_db()
+        self.assertEqual(movie.num_ratings, 3)
+        self.assertEqual(movie.avg_rating, 4)
+        
+        # edits and deletes made by the review's author update the aggregates too
+        response = self.client.patch(reverse('review-detail', args=(review_ids[2],)), {"rating": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        movie.refresh_from_db()
+        self.assertEqual(movie.avg_rating, 3)
+        
+        response = self.client.delete(reverse('review-detail', args=(review_ids[2],)))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        movie.refresh_from_db()
+        self.assertEqual(movie.num_ratings, 2)
+        self.assertEqual(movie.avg_rating, 3.5)
+        
+        # saving a loaded review takes its old rating from the load instead of reading it back
+        review = models.Review.objects.get(pk=review_ids[1])
+        review.rating = 3
+        with CaptureQueriesContext(connection) as queries:
+            review.save()
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT "movielist_app_review"')])
+        movie.refresh_from_db()
+        self.assertEqual(movie.avg_rating, 2.5)
+        
+        # a review saved without its rating loaded has it read back, instead of being counted again
+        review = models.Review.objects.only('id', 'movie', 'description').get(pk=review_ids[1])
+        review.description = "Ogre-rated"
+        with CaptureQueriesContext(connection) as queries:
+            review.save()
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('SELECT "movielist_app_review"')]), 1)
+        created = models.Review.objects.get(pk=review_ids[0]).created
+        models.Review(pk=review_ids[0], review_user=self.auth_user, movie=movie, rating=4, description="Layers",
+                      created=created, update=created).save()
+        movie.refresh_from_db()
+        self.assertEqual((movie.num_ratings, movie.rating_sum), (2, 7))
+        
+        
+    def test_review_bulk_create(self):
+        """
+        Ensure auth users can create many reviews at once
+        Ensure invalid and duplicate reviews are reported without aborting the rest of the batch
+        """
+        movie3 = models.Movie.objects.create(platform=self.stream, title="Shrek", storyline="Ogres are like onions")
+        reviews = [
+            {"movie": self.movie2.id, "rating": 3, "description": "Too long"},
+            {"movie": movie3.id, "rating": 4, "description": "Layers"},
+            {"movie": self.movie.id, "rating": 1, "description": "Already reviewed"},
+            {"movie": movie3.id, "rating": 9, "description": "Out of range"},
+            {"movie": 999, "rating": 2, "description": "No such movie"},
+        ]
+        
+        # ensure unauth users can't create reviews
+        response = self.client.post(reverse('review-bulk-create'), reviews, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.auth_token.key)
+        response = self.client.post(reverse('review-bulk-create'), reviews, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['status'] for result in response.data],
+                         ['created', 'created', 'duplicate', 'invalid', 'invalid'])
+        self.assertEqual(models.Review.objects.count(), 4)
+        
+        self.movie2.refresh_from_db()
+        self.assertEqual(self.movie2.num_ratings, 2)
+        self.assertEqual(self.movie2.avg_rating, 4)
+        
+        
+    def test_review_bulk_create_race(self):
+        """
+        Ensure a review created by a concurrent request after the duplicate check is reported as a duplicate
+            and the rest of the batch is still created
+        """
+        movie3 = models.Movie.objects.create(platform=self.stream, title="Shrek", storyline="Ogres are like onions")
+        get_reviewed_movies = views.ReviewBulkCreate.get_reviewed_movies
+        calls = []
+        
+        def check_too_early(view, movie_ids):
+            # the first check runs before the other request's review is written
+            calls.append(movie_ids)
+            if len(calls) == 1:
+                models.Review.objects.create(review_user=self.auth_user, rating=5, description="Layers", movie=movie3)
+                return set()
+            return get_reviewed_movies(view, movie_ids)
+        
+        reviews = [
+            {"movie": self.movie2.id, "rating": 3, "description": "Too long"},
+            {"movie": movie3.id, "rating": 4, "description": "Layers"},
+        ]
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.auth_token.key)
+        with mock.patch.object(views.ReviewBulkCreate, 'get_reviewed_movies', check_too_early):
+            response = self.client.post(reverse('review-bulk-create'), reviews, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['status'] for result in response.data], ['created', 'duplicate'])
+        self.assertEqual(len(calls), 2)
+        
+        movie3.refresh_from_db()
+        self.assertEqual(movie3.num_ratings, 1)
+        self.assertEqual(movie3.avg_rating, 5)
+        
+        
     def test_reviews_by_user(self):
         """
         Ensure only admin can view all of a users reviews using their user id
@@ -247,6 +434,37 @@ class ReviewTestCase(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.admin_token.key)
         response = self.client.get(reverse('reviews-by-user', args=(self.auth_user.username,)))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([review['description'] for review in response.data['results']], ["Love his shiny teeth!"])
+        
+        
+    def test_reviews_by_user_export(self):
+        """
+        Ensure admin users can export all of a users reviews as one streamed JSON array
+        """
+        for i in range(3):
+            movie = models.Movie.objects.create(platform=self.stream, title="Sequel %d" % i, storyline="Chip is back")
+            models.Review.objects.create(review_user=self.auth_user, rating=4, description="Review %d" % i, movie=movie)
+        
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.auth_token.key)
+        response = self.client.get(reverse('reviews-by-user', args=(self.auth_user.username,)), {'stream': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.admin_token.key)
+        response = self.client.get(reverse('reviews-by-user', args=(self.auth_user.username,)), {'stream': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        reviews = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([review['description'] for review in reviews],
+                         ["Love his shiny teeth!", "Review 0", "Review 1", "Review 2"])
+        self.assertEqual(reviews[0]['review_user'], "auth")
+        
+        response = self.client.get(reverse('reviews-by-user', args=("nobody",)), {'stream': 'true'})
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+        
+        # ensure chunks are joined into a single valid array
+        rows = serializers.ReviewValuesSerializer.values(models.Review.objects.order_by('id'))
+        chunks = list(streaming.render_json_array(rows, serializers.ReviewValuesSerializer, chunk_size=2))
+        self.assertEqual(len(json.loads(b''.join(chunks))), 5)
 
 
 
@@ -255,6 +473,7 @@ class ReviewTestCase(APITestCase):
 class MovieListTestCase(APITestCase):
     
     def setUp(self):
+        get_cache().clear()
         self.unauth_user = User.objects.create_user(username="example", password="password@123")        
         
         self.auth_user = User.objects.create_user(username="auth", password="auth_password")
@@ -307,6 +526,207 @@ class MovieListTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
         
         
+    def test_movie_list_pagination(self):
+        """
+        Ensure the movie list can be paged through with cursors, with or without the total count
+        """
+        for i in range(4):
+            models.Movie.objects.create(title="Sequel %d" % i, storyline="Even more Dale and Brennan", platform=self.stream)
+        
+        response = self.client.get(reverse('movie-list'), {'size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 5)
+        self.assertIsNone(response.data['previous'])
+        
+        titles = [movie['title'] for movie in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'] + '&count=false')
+            self.assertNotIn('count', response.data)
+            titles += [movie['title'] for movie in response.data['results']]
+        self.assertEqual(titles, ["Step Brothers 2", "Sequel 0", "Sequel 1", "Sequel 2", "Sequel 3"])
+        
+        # ensure oversized page sizes are clamped rather than rejected
+        response = self.client.get(reverse('movie-list'), {'size': 100, 'count': 'false'})
+        self.assertEqual(len(response.data['results']), 5)
+        
+        
+    def test_movie_search(self):
+        """
+        Ensure movies can be searched by prefixes of words in their title, storyline or platform,
+            with the best matches first and the index kept up to date as movies change
+        """
+        hulu = models.StreamPlatform.objects.create(platform="Hulu", about="#2 Platform", website="https://www.hulu.com")
+        models.Movie.objects.create(title="Talladega Nights", storyline="The ballad of Ricky Bobby", platform=hulu)
+        anchorman = models.Movie.objects.create(title="Anchorman", storyline="Brennan is not in this one", platform=hulu)
+        
+        response = self.client.get(reverse('movie-list'), {'search': 'brenn'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([movie['title'] for movie in response.data['results']], ["Step Brothers 2", "Anchorman"])
+        
+        response = self.client.get(reverse('movie-list'), {'search': 'ricky hul'})
+        self.assertEqual([movie['title'] for movie in response.data['results']], ["Talladega Nights"])
+        
+        # ensure paging through search results keeps the rank order
+        response = self.client.get(reverse('movie-list'), {'search': 'brenn', 'size': 1})
+        self.assertEqual(response.data['results'][0]['title'], "Step Brothers 2")
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['title'], "Anchorman")
+        self.assertIsNone(response.data['next'])
+        
+        # terms without any words don't filter, and the list stays in id order
+        response = self.client.get(reverse('movie-list'), {'search': '!!!'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([movie['title'] for movie in response.data['results']],
+                         ["Step Brothers 2", "Talladega Nights", "Anchorman"])
+        
+        hulu.platform = "Peacock"
+        hulu.save()
+        anchorman.delete()
+        response = self.client.get(reverse('movie-list'), {'search': 'peacock'})
+        self.assertEqual([movie['title'] for movie in response.data['results']], ["Talladega Nights"])
+        
+        
+    def test_movie_rankings(self):
+        """
+        Ensure the top and trending lists are ranked by rating and recent reviews, optionally per platform,
+            and follow review writes
+        """
+        hulu = models.StreamPlatform.objects.create(platform="Hulu", about="#2 Platform", website="https://www.hulu.com")
+        flop = models.Movie.objects.create(title="Step Brothers 3", storyline="Too much Dale and Brennan", platform=self.stream)
+        hit = models.Movie.objects.create(title="Talladega Nights", storyline="The ballad of Ricky Bobby", platform=hulu)
+        models.Movie.objects.create(title="Anchorman", storyline="Nobody has reviewed this one", platform=hulu)
+        models.Review.objects.create(review_user=self.auth_user, rating=3, description="Fine", movie=self.movie)
+        models.Review.objects.create(review_user=self.auth_user, rating=1, description="Bad", movie=flop)
+        models.Review.objects.create(review_user=self.admin_user, rating=2, description="Bad", movie=flop)
+        models.Review.objects.create(review_user=self.auth_user, rating=5, description="Great", movie=hit)
+        
+        response = self.client.get(reverse('movie-top'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([movie['title'] for movie in response.data['results']],
+                         ["Talladega Nights", "Step Brothers 2", "Step Brothers 3"])
+        response = self.client.get(reverse('movie-top'), {'platform': self.stream.pk, 'size': 1})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['results'][0]['title'], "Step Brothers 2")
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['title'], "Step Brothers 3")
+        response = self.client.get(reverse('movie-top'), {'platform': 'netflix'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        # two reviews beat one, and a newer review beats an older one
+        response = self.client.get(reverse('movie-trending'))
+        self.assertEqual([movie['title'] for movie in response.data['results']],
+                         ["Step Brothers 3", "Talladega Nights", "Step Brothers 2"])
+        response = self.client.get(reverse('movie-trending'), {'size': 2})
+        response = self.client.get(response.data['next'])
+        self.assertEqual([movie['title'] for movie in response.data['results']], ["Step Brothers 2"])
+        flop.refresh_from_db()
+        self.assertAlmostEqual(ratings.decayed(flop.trending_score), 2.0, places=3)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Review.objects.filter(movie=flop).delete()
+        response = self.client.get(reverse('movie-trending'), {'platform': self.stream.pk})
+        self.assertEqual([movie['title'] for movie in response.data['results']], ["Step Brothers 2"])
+        response = self.client.get(reverse('movie-top'))
+        self.assertEqual([movie['title'] for movie in response.data['results']], ["Talladega Nights", "Step Brothers 2"])
+        
+        
+    def test_trending_far_from_epoch(self):
+        """
+        Ensure trending scores and recent stats stay finite and follow review writes long after the epoch
+        """
+        later = ratings.TRENDING_EPOCH.replace(year=2400)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            review = models.Review.objects.create(review_user=self.auth_user, rating=2, description="Bad", movie=self.movie)
+            models.Review.objects.create(review_user=self.admin_user, rating=4, description="Good", movie=self.movie)
+            review.rating = 5
+            review.save()
+        movie = models.Movie.objects.select_related('stats').get(pk=self.movie.pk)
+        self.assertAlmostEqual(ratings.decayed(movie.trending_score, later), 2.0)
+        self.assertAlmostEqual(movie.stats.recent_avg_rating, 4.5)
+        self.assertAlmostEqual(ratings.decayed(movie.stats.recent_weight, later), 2.0)
+        
+        review.delete()
+        movie = models.Movie.objects.select_related('stats').get(pk=self.movie.pk)
+        self.assertAlmostEqual(ratings.decayed(movie.trending_score, later), 1.0)
+        self.assertAlmostEqual(movie.stats.recent_avg_rating, 4.0)
+        
+        
+
+    def test_movie_stats(self):
+        """
+        Ensure a movie's rating histogram and review counts follow review writes,
+            and that stats for several movies can be fetched at once
+        """
+        other = models.Movie.objects.create(title="Step Brothers 3", storyline="Too much Dale and Brennan", platform=self.stream)
+        review = models.Review.objects.create(review_user=self.auth_user, rating=4, description="Good", movie=self.movie)
+        models.Review.objects.create(review_user=self.admin_user, rating=2, description="Bad", movie=self.movie)
+        models.Review.objects.create(review_user=self.unauth_user, rating=2, description="Bad", movie=self.movie, active=False)
+        
+        response = self.client.get(reverse('movie-stats', args=[self.movie.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['histogram'], {'1': 0, '2': 2, '3': 0, '4': 1, '5': 0})
+        self.assertEqual(response.data['num_ratings'], 3)
+        self.assertAlmostEqual(response.data['avg_rating'], 8 / 3)
+        self.assertAlmostEqual(response.data['recent_avg_rating'], 8 / 3, places=3)
+        self.assertAlmostEqual(response.data['recent_num_ratings'], 3, places=3)
+        self.assertEqual((response.data['active_reviews'], response.data['inactive_reviews']), (2, 1))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            review.rating = 5
+            review.active = False
+            review.save()
+            review = models.Review.objects.get(rating=2, active=True)
+            review.delete()
+        response = self.client.get(reverse('movie-stats', args=[self.movie.pk]))
+        self.assertEqual(response.data['histogram'], {'1': 0, '2': 1, '3': 0, '4': 0, '5': 1})
+        self.assertEqual((response.data['active_reviews'], response.data['inactive_reviews']), (0, 2))
+        self.assertEqual(response.data['avg_rating'], models.Movie.objects.get(pk=self.movie.pk).avg_rating)
+        
+        response = self.client.get(reverse('movie-stats', args=[999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        response = self.client.get(reverse('movie-stats-batch'), {'ids': '%d,999,%d' % (other.pk, self.movie.pk)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([stats['movie'] for stats in response.data['results']], [other.pk, 999, self.movie.pk])
+        self.assertEqual(response.data['results'][0]['num_ratings'], 0)
+        self.assertEqual(response.data['results'][1]['error'], "Movie not found")
+        self.assertEqual(response.data['results'][2]['num_ratings'], 2)
+        
+        for ids in ('1,two', '1,\u0663', '1,\u00b2', '1,' + '9' * 19):
+            response = self.client.get(reverse('movie-stats-batch'), {'ids': ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('movie-stats-batch'), {'ids': ','.join(['1'] * 200)})
+        self.assertEqual([stats['movie'] for stats in response.data['results']], [1])
+        response = self.client.get(reverse('movie-stats-batch'), {'ids': ','.join(str(i) for i in range(1, 102))})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        
+    def test_movie_batch(self):
+        """
+        Ensure several movies can be fetched at once, in the requested order, with missing ones marked
+        """
+        other = models.Movie.objects.create(title="Step Brothers 3", storyline="Too much Dale and Brennan", platform=self.stream)
+        models.Review.objects.create(review_user=self.auth_user, rating=4, description="Good", movie=other)
+        
+        response = self.client.get(reverse('movie-batch'), {'ids': '%d,999,%d' % (other.pk, self.movie.pk)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([movie['id'] for movie in response.data['results']], [other.pk, 999, self.movie.pk])
+        self.assertEqual(response.data['results'][0], self.client.get(reverse('movie-detail', args=[other.pk])).data)
+        self.assertEqual(len(response.data['results'][0]['reviews']), 1)
+        self.assertEqual(response.data['results'][1], {'id': 999, 'error': "Movie not found"})
+        
+        # ensure cached batches follow writes to their movies
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Review.objects.create(review_user=self.admin_user, rating=2, description="Bad", movie=other)
+        response = self.client.get(reverse('movie-batch'), {'ids': '%d,999,%d' % (other.pk, self.movie.pk)})
+        self.assertEqual(response.data['results'][0]['num_ratings'], 2)
+        
+        response = self.client.get(reverse('movie-batch'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('movie-batch'), {'ids': ','.join(str(i) for i in range(1, 52))})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        
     def test_movie_by_id(self):
         """
         Ensure auth and unauth users can only get movies using the movie id
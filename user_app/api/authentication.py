@@ -0,0 +1,104 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import authentication, exceptions
+from imdb.instrumentation import timed
+
+
+class TokenAuthentication(authentication.TokenAuthentication):
+    """
+    DRF's token authentication, which async views can also await
+        so the token lookup doesn't block the event loop
+    """
+
+    def get_key(self, request):
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain invalid characters.'))
+
+    def authenticate(self, request):
+        with timed('auth'):
+            key = self.get_key(request)
+            if key is None:
+                return None
+            return self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        with timed('auth'):
+            key = self.get_key(request)
+            if key is None:
+                return None
+            return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
+
+
+def get_cache():
+    return caches[settings.TOKEN_CACHE_ALIAS]
+
+
+def get_cache_key(key):
+    # tokens are credentials, so only their digest is used as a cache key
+    return 'token-auth:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget(*keys):
+    get_cache().delete_many([get_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that caches each token's user id and active flag
+        for TOKEN_CACHE_TIMEOUT seconds, so most requests skip the token query
+    The user comes back with its other fields deferred, so a request only loads the fields it reads,
+        e.g. is_staff for IsAdminUser, and never from a stale or cached copy
+    The signals in user_app.models drop a token when it is saved or deleted or its user is,
+        which covers logouts, deactivations and password changes
+    """
+
+    def get_credentials(self, key, user_id, is_active):
+        if not is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        model = self.get_model()
+        user_model = model._meta.get_field('user').related_model
+        user = user_model.from_db(router.db_for_read(user_model), ['id', 'is_active'], [user_id, is_active])
+        token = model.from_db(router.db_for_read(model), ['key', 'user_id'], [key, user_id])
+        token.user = user
+        return (user, token)
+
+    def authenticate_credentials(self, key):
+        cache = get_cache()
+        credentials = cache.get(get_cache_key(key))
+        if credentials is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(get_cache_key(key), (user.pk, user.is_active), settings.TOKEN_CACHE_TIMEOUT)
+            return (user, token)
+        return self.get_credentials(key, *credentials)
+
+    async def aauthenticate_credentials(self, key):
+        cache = get_cache()
+        credentials = await cache.aget(get_cache_key(key))
+        if credentials is None:
+            user, token = await super().aauthenticate_credentials(key)
+            await cache.aset(get_cache_key(key), (user.pk, user.is_active), settings.TOKEN_CACHE_TIMEOUT)
+            return (user, token)
+        return self.get_credentials(key, *credentials)
@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
 from django.db import models
+from user_app import registration
 
 
 class RegistrationSerializer(serializers.ModelSerializer):
@@ -11,29 +13,19 @@ class RegistrationSerializer(serializers.ModelSerializer):
         model = User
         fields = ['username', 'email', 'password', 'password2']
         username = models.CharField(max_length=20, validators=[UniqueValidator(queryset=User.objects.all())])
+        # uniqueness is checked by the insert itself, see user_app.registration
         extra_kwargs = {
-            'password': {'write_only': True}
+            'password': {'write_only': True},
+            'username': {'validators': [UnicodeUsernameValidator()]},
         }
 
         
         
-        
-    def create(self, validated_data):
-        
-        password = validated_data['password']
-        password2 = validated_data['password2']
-        
-        if password != password2:
+    def validate(self, data):
+        if data['password'] != data['password2']:
             raise serializers.ValidationError({'Password and password2 should be the same'})
+        return data
         
-        
-        if User.objects.filter(username=validated_data['username']).exists():
-            raise serializers.ValidationError({'error': 'account with this username already exists'})
-        
-        
-        account = User(email=validated_data['email'], username=validated_data['username'])
-        account = User(email=validated_data['email'], username="henry")
-        account.set_password(password)
-        account.save()
-        
-        return account
\ No newline at end of file
+    def create(self, validated_data):
+        return registration.register(validated_data['username'], validated_data.get('email', ''),
+                                     validated_data['password'])
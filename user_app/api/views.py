@@ -2,7 +2,6 @@ from rest_framework import status
 
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
 
 from user_app.api.serializers import RegistrationSerializer
 
@@ -28,11 +27,9 @@ def registration_view(request):
             data['response'] = "Registration successful!"
             data['username'] = account.username
             data['email'] = account.email
-            
-            token = Token.objects.get(user=account).key
-            data['token'] = token
+            data['token'] = account.auth_token.key
             
         else:
-            data = serializer.errors
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
         return Response(data, status=status.HTTP_201_CREATED)
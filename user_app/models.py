@@ -1,9 +1,24 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
+from user_app.api import authentication
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_auth_token(sender, instance=None, created=False, **kwargs):
     if created:
-        Token.objects.create(user=instance)
\ No newline at end of file
+        Token.objects.create(user=instance)
+
+
+# cached tokens carry their user's active flag, so any change to the user (a deactivation,
+# a new password) drops them, as does saving or deleting the token. A deleted user's tokens
+# are deleted with it, each one through forget_token
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def forget_user_tokens(sender, instance=None, created=False, **kwargs):
+    if not created:
+        authentication.forget(*Token.objects.filter(user=instance).values_list('key', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Token)
+def forget_token(sender, instance=None, **kwargs):
+    authentication.forget(instance.key)
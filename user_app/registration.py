@@ -0,0 +1,22 @@
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+
+
+def register(username, email, password):
+    """
+    Create a user and its token, returning the user with its token already attached
+    The username's unique constraint is the uniqueness check, so the user and token
+        are written in one transaction without a query beforehand
+    The password is hashed on the request's thread before the transaction starts,
+        its cost is set by PASSWORD_HASH_ITERATIONS
+    """
+    user = User(username=username, email=email, password=make_password(password))
+    try:
+        with transaction.atomic():
+            # the post_save signal creates the token, which caches itself as user.auth_token
+            user.save()
+    except IntegrityError:
+        raise ValidationError({'username': ["A user with that username already exists."]})
+    return user
@@ -4,6 +4,7 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework.authtoken.models import Token
+from user_app.api import authentication
 
 
 class RegisterTestCase(APITestCase):
@@ -18,8 +19,13 @@ class RegisterTestCase(APITestCase):
             "password": "NewPassword@123",
             "password2": "NewPassword@123"
         }
-        response = self.client.post(reverse('registration_view'), data)
+        # the user and token inserts in one transaction (a savepoint inside the test's), and nothing else
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('registration_view'), data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['username'], "testcase1")
+        self.assertEqual(response.data['token'], Token.objects.get(user__username="testcase1").key)
+        self.assertTrue(User.objects.get(username="testcase1").check_password("NewPassword@123"))
         
         
         
@@ -43,13 +49,9 @@ class RegisterTestCase(APITestCase):
         response = self.client.post(reverse('registration_view'), data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         
-        try:
-            response = self.client.post(reverse('registration_view'), data2)
-            duplicate_username = True
-        except:
-            duplicate_username = False
-            
-        self.assertEqual(duplicate_username, False)
+        response = self.client.post(reverse('registration_view'), data2)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(User.objects.filter(username="testcase1").count(), 1)
 
 
 class LoginLogoutTestCase(APITestCase):
@@ -79,4 +81,30 @@ class LoginLogoutTestCase(APITestCase):
         response = self.client.post(reverse('logout'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         
-    
\ No newline at end of file
+    
+
+    def test_cached_token(self):
+        """
+        Ensure cached tokens skip the token query but stop working once revoked or their user changes
+        """
+        token = Token.objects.get(user__username="example")
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        url = reverse('reviews-by-user', args=["example"])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        # only the user id and active flag are cached, IsAdminUser loads is_staff itself
+        self.assertEqual(authentication.get_cache().get(authentication.get_cache_key(token.key)), (self.user.pk, True))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.client.post(reverse('logout')).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)